@@ -0,0 +1,94 @@
+from typing import *
+
+from Linear import linear_atom, NEGATED
+from Theory import is_theory_atom
+
+def interval(op: str, bound) -> tuple:
+    """
+    The values of the term where term op bound holds, as (lowest, highest) delta-rationals (c, k)
+    (None if unbounded), and None for a disequality
+    """
+    if op == "<=":
+        return (None, (bound, 0))
+    if op == "<":
+        return (None, (bound, -1))
+    if op == ">=":
+        return ((bound, 0), None)
+    if op == ">":
+        return ((bound, 1), None)
+    if op == "=":
+        return ((bound, 0), (bound, 0))
+    return None
+
+def disjoint(a: tuple, b: tuple) -> bool:
+    """
+    Returns true if the relations a and b ((op, bound) pairs over the same term) can not hold together
+    """
+    ia, ib = interval(*a), interval(*b)
+    if ia is None or ib is None:
+        # term != c excludes only term = c
+        other = ib if ia is None else ia
+        c = a[1] if ia is None else b[1]
+        return other is not None and other[0] == other[1] == (c, 0)
+    lows = [i[0] for i in (ia, ib) if i[0] is not None]
+    highs = [i[1] for i in (ia, ib) if i[1] is not None]
+    return bool(lows and highs) and max(lows) > min(highs)
+
+
+class BoundLemmas:
+    """
+    Eager lemmas between the arithmetic atoms over the same linear term (see Linear.LinearAtom),
+    eg. x + y <= 2 -> x + y <= 7, and not both x + y <= 2 and x + y >= 4.
+    The atoms of a term are sorted by their constants, and for every pair of them each of the four
+    combinations of their literals that no value of the term satisfies is excluded by a binary clause.
+    Pairs of neighbours come first, then the pairs two apart, and so on (in every term), until limit clauses
+    are generated, so that a limit keeps the lemmas between the atoms that are closest
+    """
+    def __init__(self, atom_rev: dict, limit: int = 10000):
+        self.limit = limit
+        # term -> [(bound, op, atom id)]
+        self.groups = {}
+        for i, atom in atom_rev.items():
+            if is_theory_atom(atom):
+                linear = linear_atom(atom)
+                if linear is not None and linear.term:
+                    self.groups.setdefault(linear.term, []).append((linear.bound, linear.op, i))
+        for group in self.groups.values():
+            group.sort()
+        self.clauses = []
+
+    def __len__(self):
+        return len(self.clauses)
+
+    def __str__(self):
+        return f"BoundLemmas(terms: {len(self.groups)}, clauses: {len(self.clauses)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def run(self) -> list[list[int]]:
+        """
+        Returns the lemma clauses (at most limit of them)
+        """
+        clauses, limit = self.clauses, self.limit
+        groups = [g for g in self.groups.values() if len(g) > 1]
+        seen = set()
+        distance = 1
+        while groups and len(clauses) < limit:
+            for group in groups:
+                for k in range(len(group) - distance):
+                    b1, op1, i = group[k]
+                    b2, op2, j = group[k + distance]
+                    for l1, r1 in ((i, (op1, b1)), (-1 * i, (NEGATED[op1], b1))):
+                        for l2, r2 in ((j, (op2, b2)), (-1 * j, (NEGATED[op2], b2))):
+                            if disjoint(r1, r2):
+                                clause = (-1 * l1, -1 * l2) if -1 * l1 < -1 * l2 else (-1 * l2, -1 * l1)
+                                if clause not in seen:
+                                    seen.add(clause)
+                                    clauses.append(list(clause))
+                    if len(clauses) >= limit:
+                        del clauses[limit:]
+                        return clauses
+            distance += 1
+            groups = [g for g in groups if len(g) > distance]
+        return clauses
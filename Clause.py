@@ -1,42 +1,62 @@
 from typing import *
-from bitarray import bitarray
+
+import numpy as np
 
 class Clause:
     """
-    Clause class that holds literals implemented as a bitarray
+    Clause class that holds literals as an int32 numpy array.
+    Memory scales with the number of literals, not with the number of variables.
+    A Clause either owns its array (eg. when built by main.py from a list of ints) or is a
+    thin view of a clause stored in a ClauseArena (see ClauseArena.clause)
     """
     def __init__(self, literals: int, init=None):
 
-        self.data = bitarray([0] * (2 * literals + 1))
         self.size = literals
-        self.literal_size = 0
-        if init:
-            for l in init:
-                self.add(l)
+        self.data = np.array(list(dict.fromkeys(init)) if init else [], dtype=np.int32)
+        for l in self.data:
+            assert not self.out_of_range(l), f"literal out of range: {l}, clause: {self.data}"
 
+    @staticmethod
+    def view(literals: int, data: np.ndarray):
+        """
+        Wraps an existing int32 array of literals without copying it
+        """
+        cl = Clause(literals)
+        cl.data = data
+        return cl
 
     def copy(self, c):
         self.data = c.data.copy()
         self.size = c.size
-        self.literal_size = c.literal_size
 
     def __str__(self):
-        return self.data.__str__()
+        return str(self.to_list())
 
     def __repr__(self):
         return self.__str__()
 
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def literal_size(self) -> int:
+        return len(self.data)
+
+    @property
+    def literals(self) -> np.ndarray:
+        return self.data
+
     def consistent(self, lit: int) -> bool:
         """
         Returns false if a negation of a literal (that is to be added) is true
         """
-        return self.data[-1 * lit] == 0
+        return not self.has(-1 * lit)
 
     def out_of_range(self, lit: int) -> bool:
         """
         Returns false if literal is out of range (not of the array, but the list of literals)
         """
-        return abs(lit) == 0 or abs(lit) > (len(self.data) - 1)/2
+        return abs(lit) == 0 or abs(lit) > self.size
 
     def add(self, lit: int):
         """
@@ -47,66 +67,37 @@ class Clause:
         #if not self.consistent(lit):
             #print(f"Clause has both literal and its negation: {self.data}")
 
-        if not (self.data[lit] == 1):
-            self.literal_size += 1
-
-        self.data[lit] = 1
+        if not self.has(lit):
+            self.data = np.append(self.data, np.int32(lit))
 
 
     def remove(self, lit: int):
         """
         Removes a literal from a clause
         """
-        #if self.data[lit] == 0:
+        #if not self.has(lit):
             #print(f"Literal already not in clause: {lit} Clause: {self.data}")
 
-        self.data[lit] = 0
-        self.literal_size -= 1
+        self.data = self.data[self.data != lit]
 
     def has(self,lit: int) -> bool:
         """
         Returns true if the clause has a literal
         """
-        if self.out_of_range(lit):
-            #print(f"literal out of range: {lit}, size: {self.data}")
-            return
-
-        return self.data[lit] == 1
+        return bool((self.data == lit).any())
 
     def negated(self):
         """
         Returns a negated clause object (ie. every literal in the clause is negated)
         """
-        negated = Clause(self.size)
-        negated.data = self.data.copy()
-        negated.literal_size = self.literal_size
-        
-        negated.data.reverse()
-        
-        negated.data >>= 1
-
-        return negated
+        return Clause.view(self.size, -1 * self.data)
 
 
     def to_list(self) -> list[int]:
         """
         just returns the clause as a list of literals ([1,2,-3...])
-        could be replaced by an iterator later...
         """
-        cl = []
-        i = 1
-        while i <= self.size:
-            if self.data[i] == 1:
-                cl.append(i)
-            i += 1
-
-        i = -1
-        while i >= -1 * self.size:
-            if self.data[i] == 1:
-                cl.append(i)
-            i -= 1
-
-        return cl
+        return self.data.tolist()
 
     def eq(self, cl) -> bool:
-        return self.data == cl.data
+        return np.array_equal(np.sort(self.data), np.sort(cl.data))
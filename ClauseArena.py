@@ -0,0 +1,195 @@
+from typing import *
+
+import numpy as np
+
+from Clause import Clause
+
+# flags in the clause header
+LEARNED = 1
+THEORY = 2
+DELETED = 4
+
+def signature(literals: Iterable[int]) -> int:
+    """
+    64-bit Bloom signature of a set of literals, one bit per literal (lit mod 64).
+    If a clause is a subset of another one, its signature is a subset of the other signature
+    """
+    sig = 0
+    for lit in literals:
+        sig |= 1 << (lit & 63)
+    return sig
+
+def grow(array: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.zeros(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class ClauseArena:
+    """
+    Contiguous clause store in CSR layout.
+    lits is one flat int32 array with the literals of every clause back to back, and clause c
+    is lits[start[c] : start[c] + size[c]]. The header arrays (start, size, flags, lbd, activity, signature)
+    are indexed by the clause index, which is how the rest of the solver refers to clauses.
+    The numpy arrays grow by doubling; the mv_* memoryviews of them are what the hot loops index,
+    since indexing a memoryview returns a plain int without going through numpy.
+    """
+    def __init__(self, lit_capacity: int = 1 << 12, clause_capacity: int = 1 << 10):
+        self.lits = np.zeros(lit_capacity, dtype=np.int32)
+        self.start = np.zeros(clause_capacity, dtype=np.int64)
+        self.size = np.zeros(clause_capacity, dtype=np.int32)
+        self.flags = np.zeros(clause_capacity, dtype=np.uint8)
+        self.lbd = np.zeros(clause_capacity, dtype=np.int32)
+        self.activity = np.zeros(clause_capacity, dtype=np.float64)
+        self.signature = np.zeros(clause_capacity, dtype=np.uint64)
+        # used literal slots, used clause slots, and literal slots of deleted clauses
+        self.lit_count = 0
+        self.count = 0
+        self.wasted = 0
+        self.refresh()
+
+    def __len__(self):
+        return self.count
+
+    def __str__(self):
+        return f"clauses: {self.count}, literals: {self.lit_count}, wasted: {self.wasted}"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def refresh(self):
+        """
+        Recreates the memoryviews after the arrays were reallocated
+        """
+        self.mv_lits = memoryview(self.lits)
+        self.mv_start = memoryview(self.start)
+        self.mv_size = memoryview(self.size)
+        self.mv_flags = memoryview(self.flags)
+        self.mv_lbd = memoryview(self.lbd)
+        self.mv_activity = memoryview(self.activity)
+        self.mv_signature = memoryview(self.signature)
+
+    def reserve(self, lits: int, clauses: int):
+        """
+        Makes room for lits more literals and clauses more clauses
+        """
+        if self.lit_count + lits > len(self.lits):
+            capacity = max(2 * len(self.lits), self.lit_count + lits)
+            self.lits = grow(self.lits, capacity)
+
+        if self.count + clauses > len(self.start):
+            capacity = max(2 * len(self.start), self.count + clauses)
+            self.start = grow(self.start, capacity)
+            self.size = grow(self.size, capacity)
+            self.flags = grow(self.flags, capacity)
+            self.lbd = grow(self.lbd, capacity)
+            self.activity = grow(self.activity, capacity)
+            self.signature = grow(self.signature, capacity)
+
+        self.refresh()
+
+    def add(self, literals: Sequence[int], flags: int = 0) -> int:
+        """
+        Appends a clause and returns its index
+        """
+        n = len(literals)
+        if self.lit_count + n > len(self.lits) or self.count + 1 > len(self.start):
+            self.reserve(n, 1)
+
+        c = self.count
+        s = self.lit_count
+        self.lits[s:s + n] = literals
+        self.mv_start[c] = s
+        self.mv_size[c] = n
+        self.mv_flags[c] = flags
+        self.mv_lbd[c] = n
+        self.mv_activity[c] = 0.0
+        self.mv_signature[c] = signature(self.mv_lits[s:s + n])
+        self.lit_count += n
+        self.count += 1
+        return c
+
+    def add_all(self, lits: np.ndarray, offsets: np.ndarray, flags: int = 0) -> range:
+        """
+        Appends many clauses in CSR form at once (clause i is lits[offsets[i]:offsets[i + 1]]),
+        filling the header arrays with vector operations. Returns the range of the new clause indices
+        """
+        n = len(offsets) - 1
+        total = int(offsets[-1]) - int(offsets[0])
+        self.reserve(total, n)
+
+        c, s = self.count, self.lit_count
+        sizes = np.diff(offsets)
+        self.lits[s:s + total] = lits[offsets[0]:offsets[-1]]
+        self.start[c:c + n] = s + offsets[:-1] - offsets[0]
+        self.size[c:c + n] = sizes
+        self.flags[c:c + n] = flags
+        self.lbd[c:c + n] = sizes
+        self.activity[c:c + n] = 0.0
+
+        # or of the literal bits of every clause, a 0 is appended so that empty clauses have a valid index
+        bits = np.left_shift(np.uint64(1), (self.lits[s:s + total] & 63).astype(np.uint64))
+        signatures = np.bitwise_or.reduceat(np.append(bits, np.uint64(0)), offsets[:-1] - offsets[0]) if n else bits
+        signatures[sizes == 0] = 0
+        self.signature[c:c + n] = signatures
+
+        self.lit_count += total
+        self.count += n
+        return range(c, c + n)
+
+    def literals(self, c: int) -> memoryview:
+        """
+        Returns the literals of a clause as a memoryview of the arena (no copy)
+        """
+        s = self.mv_start[c]
+        return self.mv_lits[s:s + self.mv_size[c]]
+
+    def to_list(self, c: int) -> list[int]:
+        return self.literals(c).tolist()
+
+    def clause(self, c: int, problem_size: int) -> Clause:
+        """
+        Returns a Clause viewing the literals of clause c in the arena
+        """
+        s = self.mv_start[c]
+        return Clause.view(problem_size, self.lits[s:s + self.mv_size[c]])
+
+    def delete(self, c: int):
+        self.mv_flags[c] |= DELETED
+        self.wasted += self.mv_size[c]
+
+    def deleted(self, c: int) -> bool:
+        return bool(self.mv_flags[c] & DELETED)
+
+    def compact(self) -> np.ndarray:
+        """
+        Drops the deleted clauses from the arena, moving the others to the front in order.
+        Returns the remap array: remap[old index] is the new index, or -1 if the clause was deleted
+        """
+        count = self.count
+        keep = (self.flags[:count] & DELETED) == 0
+        remap = np.full(count, -1, dtype=np.int64)
+        remap[keep] = np.arange(int(keep.sum()))
+
+        sizes = self.size[:count][keep]
+        starts = self.start[:count][keep]
+        new_starts = np.zeros(len(sizes), dtype=np.int64)
+        np.cumsum(sizes[:-1], out=new_starts[1:])
+        total = int(sizes.sum())
+
+        # position of every kept literal in the old literal array
+        gather = np.repeat(starts - new_starts, sizes) + np.arange(total)
+        self.lits[:total] = self.lits[gather]
+
+        n = len(sizes)
+        self.start[:n] = new_starts
+        self.size[:n] = sizes
+        self.flags[:n] = self.flags[:count][keep]
+        self.lbd[:n] = self.lbd[:count][keep]
+        self.activity[:n] = self.activity[:count][keep]
+        self.signature[:n] = self.signature[:count][keep]
+
+        self.count = n
+        self.lit_count = total
+        self.wasted = 0
+        return remap
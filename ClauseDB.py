@@ -0,0 +1,197 @@
+from typing import *
+
+from Clause import Clause
+from ClauseArena import ClauseArena, LEARNED, THEORY
+from ClauseIndex import ClauseIndex
+from Model import Model, THEORY_REASON
+from Watches import Watches
+
+class ClauseDB:
+    """
+    Clause database that keeps the original clauses, the learned clauses and the theory (blocking) clauses apart.
+    The clauses themselves live in a ClauseArena, the database holds their indices.
+    Learned and theory clauses are scored by their LBD (literal block distance) and their activity
+    (bumped whenever they take part in a conflict), and the low-value half of them is periodically deleted.
+    Core clauses (LBD <= core_lbd) and clauses that are currently the reason of a literal are never deleted.
+    Every clause is in a ClauseIndex, to look up duplicate and subsuming clauses.
+    """
+    def __init__(self, clause_set: Iterable[Union[Clause, Sequence[int]]] = (), first_reduce: int = 2000, reduce_increment: int = 300,
+                 clause_decay: float = 0.999, core_lbd: int = 2):
+        self.arena = ClauseArena()
+        self.index = ClauseIndex(self.arena)
+        self.original = []
+        self.learned = []
+        self.theory = []
+
+        self.increment = 1.0
+        self.clause_decay = clause_decay
+        self.core_lbd = core_lbd
+
+        # the number of conflicts between reductions grows by reduce_increment after every reduction
+        self.reduce_interval = first_reduce
+        self.reduce_increment = reduce_increment
+        self.next_reduce = first_reduce
+        self.conflicts = 0
+        self.deleted = 0
+
+        for clause in clause_set:
+            self.add(clause)
+
+    def __len__(self):
+        return len(self.original) + len(self.learned) + len(self.theory)
+
+    def __iter__(self):
+        """
+        Iterates over the indices of every clause in the database
+        """
+        yield from self.original
+        yield from self.learned
+        yield from self.theory
+
+    def __str__(self):
+        return f"original: {len(self.original)}, learned: {len(self.learned)}, theory: {len(self.theory)}, deleted: {self.deleted}"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def add(self, clause: Union[Clause, Sequence[int]]) -> int:
+        """
+        Adds an original clause and returns its index
+        """
+        c = self.arena.add(literals_of(clause))
+        self.index.add(c)
+        self.original.append(c)
+        return c
+
+    def add_all(self, lits, offsets) -> range:
+        """
+        Adds many original clauses in CSR form at once (see ClauseArena.add_all) and returns their indices.
+        The clauses should not have repeated literals
+        """
+        clauses = self.arena.add_all(lits, offsets)
+        for c in clauses:
+            self.index.add(c)
+        self.original.extend(clauses)
+        return clauses
+
+    def add_learned(self, literals: Sequence[int], lbd: int) -> int:
+        c = self.arena.add(literals, LEARNED)
+        self.arena.mv_lbd[c] = lbd
+        self.arena.mv_activity[c] = self.increment
+        self.index.add(c)
+        self.learned.append(c)
+        return c
+
+    def add_theory(self, clause: Union[Clause, Sequence[int]]) -> int:
+        """
+        Adds a theory clause, it is scored like a learned clause (starting from its size as LBD)
+        """
+        c = self.arena.add(literals_of(clause), THEORY)
+        self.arena.mv_activity[c] = self.increment
+        self.index.add(c)
+        self.theory.append(c)
+        return c
+
+    def contains(self, literals: Sequence[int]) -> bool:
+        """
+        Returns true if a clause with the same literals is in the database
+        """
+        return self.index.find(literals) is not None
+
+    def subsumes(self, literals: Sequence[int]) -> bool:
+        """
+        Returns true if a clause in the database subsumes (is a subset of) the given literals
+        """
+        return self.index.subsuming(literals) is not None
+
+    def bump(self, c: int, model: Model):
+        """
+        Bumps the activity of a learned or theory clause that took part in a conflict,
+        and lowers its LBD if it is smaller under the current model
+        """
+        arena = self.arena
+        if not arena.mv_flags[c]:
+            return
+
+        activity = arena.mv_activity
+        activity[c] += self.increment
+        if activity[c] > 1e20:
+            arena.activity[:arena.count] *= 1e-20
+            self.increment *= 1e-20
+
+        lbd = arena.mv_lbd
+        if lbd[c] > self.core_lbd:
+            new_lbd = model.lbd(arena.literals(c))
+            if new_lbd < lbd[c]:
+                lbd[c] = new_lbd
+
+    def decay(self):
+        self.increment /= self.clause_decay
+
+    def on_conflict(self) -> bool:
+        """
+        Counts a conflict and returns true if the database is due for a reduction
+        """
+        self.conflicts += 1
+        return self.conflicts >= self.next_reduce
+
+    def locked(self, c: int, model: Model) -> bool:
+        """
+        Returns true if the clause is the reason of its first literal (implied literals are always put first)
+        """
+        lit = self.arena.mv_lits[self.arena.mv_start[c]]
+        return model.reason[abs(lit)] == c and model.has(lit)
+
+    def reduce(self, model: Model, watches: Watches):
+        """
+        Deletes the worse half (highest LBD, then lowest activity) of the learned and theory clauses
+        that are neither core nor locked, and drops them from the watch lists.
+        The arena is compacted once more than half of it is deleted clauses
+        """
+        self.reduce_interval += self.reduce_increment
+        self.next_reduce = self.conflicts + self.reduce_interval
+
+        arena = self.arena
+        lbd, activity, size = arena.mv_lbd, arena.mv_activity, arena.mv_size
+        candidates = [c for c in self.learned + self.theory
+                      if lbd[c] > self.core_lbd and size[c] > 2 and not self.locked(c, model)]
+        candidates.sort(key=lambda c: (-lbd[c], activity[c]))
+        deleted = set(candidates[:len(candidates) // 2])
+
+        if not deleted:
+            return
+
+        for c in deleted:
+            arena.delete(c)
+        self.learned = [c for c in self.learned if c not in deleted]
+        self.theory = [c for c in self.theory if c not in deleted]
+        self.deleted += len(deleted)
+
+        if 2 * arena.wasted > arena.lit_count:
+            self.compact(model, watches)
+        else:
+            watches.detach(deleted)
+            self.index.detach(deleted)
+
+    def compact(self, model: Model, watches: Watches):
+        """
+        Compacts the arena and renumbers the clause indices everywhere they are held
+        """
+        remap = self.arena.compact()
+        watches.remap(remap)
+        remap = remap.tolist()
+        self.index.remap(remap)
+        self.original = [remap[c] for c in self.original]
+        self.learned = [remap[c] for c in self.learned]
+        self.theory = [remap[c] for c in self.theory]
+        reason = model.reason
+        for lit in model.trail:
+            v = abs(lit)
+            if reason[v] is not None and reason[v] != THEORY_REASON:
+                reason[v] = remap[reason[v]]
+
+
+def literals_of(clause: Union[Clause, Sequence[int]]) -> Sequence[int]:
+    if isinstance(clause, Clause):
+        return clause.data
+    return list(dict.fromkeys(clause))
@@ -0,0 +1,90 @@
+from typing import *
+
+from ClauseArena import ClauseArena, signature
+
+class ClauseIndex:
+    """
+    Hash index over the clauses of a ClauseArena to find duplicate and subsuming clauses.
+    keys maps the sorted literals of a clause to its index, so looking up a duplicate is one dict lookup.
+    For subsumption every clause is also put in the bucket of one of its literals (the one with the
+    smallest bucket at the time). A clause D can only subsume C if the bucket literal of D is in C, and
+    only if the signature of D is a subset of the signature of C, which rules out almost every candidate
+    without looking at its literals.
+    """
+    def __init__(self, arena: ClauseArena):
+        self.arena = arena
+        self.keys = {}
+        self.buckets = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, c: int):
+        literals = self.arena.to_list(c)
+        self.keys.setdefault(tuple(sorted(literals)), c)
+        if not literals:
+            return
+        buckets = self.buckets
+        lit = min(literals, key=lambda lit: len(buckets.get(lit, ())))
+        buckets.setdefault(lit, []).append(c)
+
+    def find(self, literals: Iterable[int]) -> Optional[int]:
+        """
+        Returns the index of a clause with the same literals, or None
+        """
+        return self.keys.get(tuple(sorted(literals)))
+
+    def subsuming(self, literals: Sequence[int]) -> Optional[int]:
+        """
+        Returns the index of a clause whose literals are a subset of the given literals
+        (a duplicate included), or None
+        """
+        c = self.find(literals)
+        if c is not None:
+            return c
+        return self.search(set(literals), False)
+
+    def search(self, lits: set[int], same_size: bool) -> Optional[int]:
+        """
+        Looks for a clause that is a subset of lits (of the same size, ie. a duplicate, if same_size is true)
+        in the buckets of the literals of lits
+        """
+        arena = self.arena
+        sizes, sigs = arena.mv_size, arena.mv_signature
+        outside = ~signature(lits)
+        for lit in lits:
+            for d in self.buckets.get(lit, ()):
+                if sigs[d] & outside == 0 and (sizes[d] == len(lits) if same_size else sizes[d] <= len(lits)) \
+                        and all(q in lits for q in arena.literals(d)):
+                    return d
+        return None
+
+    def detach(self, deleted: set[int]):
+        """
+        Drops the clauses in deleted from the index
+        """
+        lost = [key for key, c in self.keys.items() if c in deleted]
+        for lit, bucket in self.buckets.items():
+            self.buckets[lit] = [c for c in bucket if c not in deleted]
+        self.rekey(lost)
+
+    def remap(self, remap: list[int]):
+        """
+        Renumbers the clauses after the arena was compacted (remap[old] is the new index or -1)
+        """
+        lost = [key for key, c in self.keys.items() if remap[c] < 0]
+        self.keys = {key: remap[c] for key, c in self.keys.items() if remap[c] >= 0}
+        for lit, bucket in self.buckets.items():
+            self.buckets[lit] = [remap[c] for c in bucket if remap[c] >= 0]
+        self.rekey(lost)
+
+    def rekey(self, lost: list[tuple]):
+        """
+        The clause a key pointed to is gone, point the key to a duplicate that is left (if there is one)
+        """
+        for key in lost:
+            c = self.search(set(key), True) if key else None
+            if c is None:
+                self.keys.pop(key, None)
+            else:
+                self.keys[key] = c
@@ -0,0 +1,99 @@
+from typing import *
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+class ClauseRing:
+    """
+    Ring buffer of clauses in shared memory, for the workers of a portfolio to share their short learned clauses.
+    data[0] is the number of ints written so far, data[1:] the ring of capacity ints that holds the records
+    [worker, length, literals...] one after the other (a record wraps around the end of the ring).
+    Writers and readers take the lock, every reader keeps its own position (the number of ints it has read).
+    A reader that falls more than a whole ring behind skips the clauses that were overwritten.
+    The ring is created before the workers are forked, and has to be closed (and unlinked by its creator)
+    """
+    def __init__(self, capacity: int = 1 << 16, lock=None):
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(create=True, size=8 * (capacity + 1))
+        self.data = np.ndarray((capacity + 1,), dtype=np.int64, buffer=self.shm.buf)
+        self.data[0] = 0
+        self.lock = mp.Lock() if lock is None else lock
+
+    def __str__(self):
+        return f"ClauseRing(capacity: {self.capacity}, written: {int(self.data[0])})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def push(self, worker: int, literals: Sequence[int]):
+        n = len(literals) + 2
+        if n > self.capacity:
+            return
+        record = np.empty(n, dtype=np.int64)
+        record[0] = worker
+        record[1] = len(literals)
+        record[2:] = literals
+        with self.lock:
+            written = int(self.data[0])
+            self.data[1 + (written + np.arange(n)) % self.capacity] = record
+            self.data[0] = written + n
+
+    def pull(self, worker: int, position: int) -> (list[list[int]], int):
+        """
+        Returns the clauses of the other workers written since position, and the new position
+        """
+        with self.lock:
+            written = int(self.data[0])
+            if written - position > self.capacity:
+                # overwritten before this reader got to them
+                position = written
+            if written == position:
+                return ([], position)
+            ints = self.data[1 + (position + np.arange(written - position)) % self.capacity].tolist()
+
+        clauses = []
+        i = 0
+        while i < len(ints):
+            length = ints[i + 1]
+            if ints[i] != worker:
+                clauses.append(ints[i + 2:i + 2 + length])
+            i += 2 + length
+        return (clauses, written)
+
+    def close(self, unlink: bool = False):
+        self.data = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class Share:
+    """
+    The end of a clause ring that one worker uses: it exports its learned clauses of LBD <= lbd,
+    and fetches the ones of the other workers
+    """
+    def __init__(self, ring: ClauseRing, worker: int, lbd: int = 3):
+        self.ring = ring
+        self.worker = worker
+        self.lbd = lbd
+        self.position = 0
+        self.exported = 0
+        self.imported = 0
+
+    def __str__(self):
+        return f"Share(worker: {self.worker}, exported: {self.exported}, imported: {self.imported})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def export(self, literals: Sequence[int], lbd: int):
+        if lbd <= self.lbd:
+            self.ring.push(self.worker, literals)
+            self.exported += 1
+
+    def fetch(self) -> list[list[int]]:
+        clauses, self.position = self.ring.pull(self.worker, self.position)
+        self.imported += len(clauses)
+        return clauses
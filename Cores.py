@@ -0,0 +1,99 @@
+from typing import *
+
+from collections import OrderedDict
+
+from Stats import Stats
+
+CORE_MINIMIZATIONS = ("none", "deletion", "quickxplain")
+
+class CoreMinimizer:
+    """
+    Shrinks the unsat cores of theory conflicts before they become conflict or blocking clauses.
+    check(literals) checks a set of theory literals on its own and returns None if it is consistent,
+    otherwise a core of it (the theory solvers pass their check_subset).
+    deletion drops one literal after the other and keeps the ones without which the rest is consistent,
+    shrinking the candidate to the core of every inconsistent check (clause-set refinement);
+    quickxplain (Junker) splits the candidate in halves and needs O(k log(n/k)) checks for a core of k out of n.
+    Both stop after budget seconds and keep what they have, which is still a core.
+    Minimized cores are cached by the core they came from (an LRU cache of cache_size entries).
+    stats counts the cores, and their literals before and after minimization
+    """
+    def __init__(self, strategy: str = "deletion", budget: float = 0.1, cache_size: int = 1024, stats: Optional[Stats] = None):
+        if strategy not in CORE_MINIMIZATIONS:
+            raise ValueError(f"unknown core minimization: {strategy}, expected one of {list(CORE_MINIMIZATIONS)}")
+        self.strategy = strategy
+        self.budget = budget
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.stats = Stats() if stats is None else stats
+        self.checks = 0
+        self.deadline = 0.0
+
+    def __str__(self):
+        return f"CoreMinimizer({self.strategy}, checks: {self.checks}, cached: {len(self.cache)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def minimize(self, core: Sequence[int], check: Optional[Callable[[list[int]], Optional[list[int]]]]) -> list[int]:
+        """
+        Returns a subset of the (inconsistent) literals of core that is still inconsistent.
+        Without check, the core is known to be minimal already and only counted
+        """
+        stats = self.stats
+        stats.cores += 1
+        stats.core_literals += len(core)
+        if self.strategy == "none" or check is None or len(core) <= 1:
+            stats.minimized_core_literals += len(core)
+            return list(core)
+
+        key = tuple(sorted(core))
+        minimized = self.cache.get(key)
+        if minimized is None:
+            self.deadline = stats.clock() + self.budget
+            if self.strategy == "deletion":
+                minimized = self.deletion(list(core), check)
+            else:
+                minimized = self.quickxplain([], list(core), False, check)
+            if self.cache_size > 0:
+                self.cache[key] = minimized
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        stats.minimized_core_literals += len(minimized)
+        return list(minimized)
+
+    def consistent(self, literals: list[int], check) -> Optional[list[int]]:
+        self.checks += 1
+        return check(literals)
+
+    def deletion(self, core: list[int], check) -> list[int]:
+        i = 0
+        while i < len(core) and self.stats.clock() < self.deadline:
+            candidate = core[:i] + core[i + 1:]
+            sub = self.consistent(candidate, check)
+            if sub is None:
+                # core[i] is in every core of core, and so are the ones before it
+                i += 1
+            else:
+                sub = set(sub)
+                core = [lit for lit in candidate if lit in sub]
+        return core
+
+    def quickxplain(self, background: list[int], constraints: list[int], changed: bool, check) -> list[int]:
+        """
+        A minimal subset of constraints that is inconsistent together with background
+        (which has to be inconsistent with all of constraints)
+        """
+        if self.stats.clock() >= self.deadline:
+            return constraints
+        if changed and self.consistent(background, check) is not None:
+            return []
+        if len(constraints) == 1:
+            return constraints
+        k = len(constraints) // 2
+        first, second = constraints[:k], constraints[k:]
+        d2 = self.quickxplain(background + first, second, True, check)
+        d1 = self.quickxplain(background + d2, first, len(d2) > 0, check)
+        return d1 + d2
@@ -0,0 +1,217 @@
+from typing import *
+
+import math
+import multiprocessing as mp
+import os
+import queue
+import signal
+import sys
+import threading
+import traceback
+
+from cdcl import Solver
+from ClauseDB import ClauseDB
+from Portfolio import orphaned
+
+def probe(solver: Solver, lit: int) -> Optional[int]:
+    """
+    Decides lit on a new level and propagates it. Returns the number of literals it implies,
+    or None if it leads to a conflict. The model is back at its level afterwards
+    """
+    model = solver.model
+    level = model.decision_level()
+    start = len(model.trail)
+    model.add_decide(lit)
+    conflict = solver.watches.propagate(model)
+    implied = len(model.trail) - start
+    model.backjump(level)
+    return None if conflict is not None else implied
+
+
+class Lookahead:
+    """
+    Splits a clause set into cubes (sets of assumptions that together cover every assignment but
+    the ones refuted by propagation), using the model and watches of a solver for propagation.
+    At every node of the split tree the candidate variables (the unassigned ones that occur most often)
+    are probed in both polarities: a literal whose propagation fails is a failed literal, its negation
+    holds in the whole subtree; otherwise the variable that implies the most in both branches
+    ((pos + 1) * (neg + 1), as in march) is split on
+    """
+    def __init__(self, solver: Solver, candidates: int = 64):
+        self.solver = solver
+        self.candidates = candidates
+        arena = solver.db.arena
+        self.occurrences = [0] * (solver.size + 1)
+        for c in solver.db:
+            for lit in arena.literals(c):
+                self.occurrences[abs(lit)] += 1
+        self.order = sorted(range(1, solver.size + 1), key=lambda v: -self.occurrences[v])
+        self.failed = 0
+        self.probes = 0
+        # a model found while splitting
+        self.sat_model = None
+
+    def __str__(self):
+        return f"Lookahead(probes: {self.probes}, failed literals: {self.failed})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def select(self) -> Optional[int]:
+        """
+        Returns the variable to split on, 0 if every variable is assigned, or None if the node is refuted.
+        Failed literals are assigned at the level of the node on the way
+        """
+        solver, model = self.solver, self.solver.model
+        again = True
+        while again:
+            again = False
+            best, best_score = 0, -1
+            tried = 0
+            for v in self.order:
+                if model.has(v) or model.has(-1 * v):
+                    continue
+                if tried == self.candidates:
+                    break
+                tried += 1
+                self.probes += 2
+                pos, neg = probe(solver, v), probe(solver, -1 * v)
+                if pos is None and neg is None:
+                    return None
+                if pos is None or neg is None:
+                    self.failed += 1
+                    model.add(-1 * v if pos is None else v)
+                    if solver.watches.propagate(model) is not None:
+                        return None
+                    # the node has more literals now, probe again
+                    again = True
+                    break
+                score = (pos + 1) * (neg + 1)
+                if score > best_score:
+                    best, best_score = v, score
+        return best
+
+    def split(self, depth: int) -> list[list[int]]:
+        """
+        Returns the cubes of a split tree of the given depth (empty if the clause set is refuted,
+        see sat_model for a model found on the way)
+        """
+        model = self.solver.model
+        model.backjump(0)
+        if self.solver.unsat or self.solver.watches.propagate(model) is not None:
+            return []
+        cubes = []
+        self.branch(depth, [], cubes)
+        model.backjump(0)
+        return cubes
+
+    def branch(self, depth: int, cube: list[int], cubes: list[list[int]]):
+        model = self.solver.model
+        if self.sat_model is not None:
+            return
+        if model.is_complete():
+            self.sat_model = model.to_list()
+            return
+        if depth == 0:
+            cubes.append(cube)
+            return
+
+        v = self.select()
+        if v is None:
+            return
+        if v == 0:
+            self.sat_model = model.to_list()
+            return
+        level = model.decision_level()
+        for lit in (v, -1 * v):
+            model.add_decide(lit)
+            if self.solver.watches.propagate(model) is None:
+                self.branch(depth - 1, cube + [lit], cubes)
+            model.backjump(level)
+
+
+class CubeAndConquer:
+    """
+    Cube-and-conquer: the lookahead splits the clause set into cubes, which worker processes solve
+    with the assumptions interface of an incremental solver each (so that what they learn on one cube
+    helps on the next). The cubes are handed out from one queue, an idle worker takes the next one,
+    so that a worker stuck on a hard cube does not hold up the easy ones.
+    The first satisfiable cube ends the search, and so does a cube that is unsat without its assumptions
+    (the clause set is unsat); otherwise the clause set is unsat when every cube is.
+    The workers are forked, the clause database is not pickled
+    """
+    def __init__(self, workers: int, depth: Optional[int] = None, restart: str = "luby", candidates: int = 64):
+        self.workers = workers
+        # 4 cubes per worker by default
+        self.depth = depth if depth is not None else max(1, math.ceil(math.log2(4 * workers)))
+        self.restart = restart
+        self.candidates = candidates
+        self.cubes = 0
+        self.refuted = 0
+
+    def __str__(self):
+        return f"CubeAndConquer(workers: {self.workers}, depth: {self.depth}, cubes: {self.cubes}, refuted: {self.refuted})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def solve(self, literals: int, db: ClauseDB) -> Optional[list[int]]:
+        lookahead = Lookahead(Solver(literals, db=db, restart=self.restart), self.candidates)
+        cubes = lookahead.split(self.depth)
+        self.cubes = len(cubes)
+        if lookahead.sat_model is not None:
+            return lookahead.sat_model
+        if not cubes:
+            return None
+
+        previous = signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+        ctx = mp.get_context("fork")
+        tasks = ctx.Queue()
+        results = ctx.Queue()
+        for cube in cubes:
+            tasks.put(cube)
+        for _ in range(self.workers):
+            tasks.put(None)
+        workers = [ctx.Process(target=self.worker, args=(literals, db, tasks, results), daemon=True) for _ in range(self.workers)]
+        try:
+            for p in workers:
+                p.start()
+            while self.refuted < len(cubes):
+                try:
+                    answer, value = results.get(timeout=0.1)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in workers) and results.empty():
+                        raise RuntimeError("the cube-and-conquer workers died before every cube was solved")
+                    continue
+                if answer == "sat":
+                    return value
+                if answer == "unsat" and not value:
+                    # unsat without the assumptions of the cube
+                    return None
+                self.refuted += 1
+            return None
+        finally:
+            for p in workers:
+                p.kill()
+            for p in workers:
+                p.join()
+            signal.signal(signal.SIGTERM, previous)
+
+    def worker(self, literals: int, db: ClauseDB, tasks, results):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        threading.Thread(target=orphaned, args=(os.getppid(),), daemon=True).start()
+        try:
+            solver = Solver(literals, db=db, restart=self.restart)
+            while True:
+                cube = tasks.get()
+                if cube is None:
+                    break
+                model = solver.solve(cube)
+                if model is not None:
+                    results.put(("sat", model))
+                    break
+                results.put(("unsat", solver.failed))
+                if not solver.failed:
+                    break
+        except Exception:
+            traceback.print_exc()
@@ -0,0 +1,117 @@
+from typing import *
+
+import bz2
+import gzip
+import lzma
+import mmap
+import re
+
+import numpy as np
+
+# comment and problem lines are dropped before the integers are tokenized, a % line ends the
+# clauses (SATLIB files have a "%\n0\n" trailer)
+COMMENT = re.compile(rb"^[cp].*$", re.MULTILINE)
+END = re.compile(rb"^%", re.MULTILINE)
+HEADER = re.compile(rb"^p\s+cnf\s+(\d+)\s+(\d+)", re.MULTILINE)
+
+OPENERS = {".gz": gzip.open, ".xz": lzma.open, ".lzma": lzma.open, ".bz2": bz2.open}
+CHUNK = 1 << 22
+
+def blocks(fname: str) -> Iterator[bytes]:
+    """
+    Yields the contents of a DIMACS file in blocks that end at a line break.
+    A plain file is one memory mapped block, compressed files are decompressed in chunks
+    """
+    for suffix, opener in OPENERS.items():
+        if fname.endswith(suffix):
+            with opener(fname, "rb") as f:
+                rest = b""
+                while True:
+                    chunk = f.read(CHUNK)
+                    if not chunk:
+                        break
+                    chunk = rest + chunk
+                    cut = chunk.rfind(b"\n") + 1
+                    rest = chunk[cut:]
+                    yield chunk[:cut]
+                yield rest
+            return
+
+    with open(fname, "rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+        except ValueError:
+            # empty file
+            yield b""
+
+def tokenize(block) -> (np.ndarray, bool):
+    """
+    Returns the integers of a block, and true if the block has the end of the clauses in it
+    """
+    end = END.search(block)
+    if end is not None:
+        block = block[:end.start()]
+    ints = np.fromstring(COMMENT.sub(b"", block), dtype=np.int64, sep=" ")
+    return (ints, end is not None)
+
+def split_clauses(ints: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Splits the zero terminated integer stream into clauses in CSR form,
+    clause i is lits[offsets[i]:offsets[i + 1]] (a last clause without its 0 is kept)
+    """
+    zeros = np.flatnonzero(ints == 0)
+    lits = ints[ints != 0].astype(np.int32)
+    ends = zeros - np.arange(len(zeros))
+    if len(lits) > (ends[-1] if len(ends) else 0):
+        ends = np.append(ends, len(lits))
+    offsets = np.concatenate(([0], ends)).astype(np.int64)
+    return (lits, offsets)
+
+def normalize(lits: np.ndarray, offsets: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Drops repeated literals in a clause and the clauses that have a literal and its negation,
+    the literals of every clause end up sorted by variable
+    """
+    sizes = np.diff(offsets)
+    clause = np.repeat(np.arange(len(sizes)), sizes)
+    order = np.lexsort((lits, np.abs(lits), clause))
+    lits = lits[order]
+    clause = clause[order]
+
+    same = clause[1:] == clause[:-1]
+    keep = np.ones(len(lits), dtype=bool)
+    keep[1:] = ~(same & (lits[1:] == lits[:-1]))
+    tautology = np.zeros(len(sizes), dtype=bool)
+    tautology[clause[1:][same & (lits[1:] == -1 * lits[:-1])]] = True
+    keep &= ~tautology[clause]
+
+    lits = lits[keep]
+    sizes = np.bincount(clause[keep], minlength=len(sizes))[~tautology]
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    return (lits, offsets)
+
+def read_dimacs(fname: str) -> (np.ndarray, np.ndarray, int):
+    """
+    Reads a DIMACS cnf file (possibly gzip, xz or bzip2 compressed).
+    Returns the literals and clause offsets (see split_clauses) and the number of variables,
+    which is the larger of the p line and the largest variable in the clauses
+    """
+    parts = []
+    variables = 0
+    for block in blocks(fname):
+        if not parts:
+            header = HEADER.search(block)
+            if header is not None:
+                variables = int(header.group(1))
+        ints, end = tokenize(block)
+        parts.append(ints)
+        if end:
+            break
+
+    ints = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+    lits, offsets = normalize(*split_clauses(ints))
+    if len(lits):
+        variables = max(variables, int(np.abs(lits).max()))
+    return (lits, offsets, variables)
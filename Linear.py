@@ -0,0 +1,128 @@
+from typing import *
+
+from fractions import Fraction
+
+# the relation of the negated atom, the negation of an equality is a disequality
+NEGATED = {"<=": ">", "<": ">=", ">=": "<", ">": "<=", "=": "!=", "!=": "="}
+# the relation after both sides are multiplied by a negative number
+FLIPPED = {"<=": ">=", "<": ">", ">=": "<=", ">": "<", "=": "=", "!=": "!="}
+
+class LinearAtom:
+    """
+    An arithmetic atom in the normal form term op bound (eg. x - 1/2 y <= 3).
+    term is a tuple of (variable name, coefficient) pairs sorted by name whose first coefficient is 1,
+    so atoms over multiples of the same sum share their term; op is one of <=, <, >=, >, =.
+    A term without variables is a constant atom (eg. 0 <= 3)
+    """
+    __slots__ = ("term", "op", "bound")
+
+    def __init__(self, term: tuple[tuple[str, Fraction], ...], op: str, bound: Fraction):
+        self.term = term
+        self.op = op
+        self.bound = bound
+
+    def __str__(self):
+        term = " + ".join(f"{a} {name}" for name, a in self.term) or "0"
+        return f"{term} {self.op} {self.bound}"
+
+    def __repr__(self):
+        return f"LinearAtom({self.__str__()})"
+
+    def holds(self, values: dict, op: Optional[str] = None) -> bool:
+        """
+        Returns true if the atom (with relation op instead of its own) holds for the values of its variables
+        """
+        value = sum(a * values.get(name, 0) for name, a in self.term)
+        op = self.op if op is None else op
+        if op == "<=":
+            return value <= self.bound
+        if op == "<":
+            return value < self.bound
+        if op == ">=":
+            return value >= self.bound
+        if op == ">":
+            return value > self.bound
+        if op == "=":
+            return value == self.bound
+        return value != self.bound
+
+
+def linear_term(node) -> Optional[tuple[dict, Fraction]]:
+    """
+    The coefficients (by variable name) and the constant of an arithmetic term,
+    or None if the term is not linear (eg. x * y, or an if-then-else term)
+    """
+    if node.is_symbol():
+        return ({node.symbol_name(): Fraction(1)}, Fraction(0))
+    if node.is_constant():
+        return ({}, Fraction(node.constant_value()))
+    if node.is_toreal():
+        return linear_term(node.arg(0))
+
+    if node.is_plus() or node.is_minus():
+        coeffs = {}
+        constant = Fraction(0)
+        for i, arg in enumerate(node.args()):
+            t = linear_term(arg)
+            if t is None:
+                return None
+            sign = -1 if node.is_minus() and i > 0 else 1
+            for name, a in t[0].items():
+                coeffs[name] = coeffs.get(name, 0) + sign * a
+            constant += sign * t[1]
+        return ({name: a for name, a in coeffs.items() if a != 0}, constant)
+
+    if node.is_times():
+        coeffs = {}
+        factor = Fraction(1)
+        for arg in node.args():
+            t = linear_term(arg)
+            if t is None or (t[0] and coeffs):
+                return None
+            if t[0]:
+                coeffs, constant = t
+            else:
+                factor *= t[1]
+        if not coeffs:
+            return ({}, factor)
+        return ({name: factor * a for name, a in coeffs.items() if factor != 0}, factor * constant)
+
+    if node.is_div():
+        t, d = linear_term(node.arg(0)), linear_term(node.arg(1))
+        if t is None or d is None or d[0] or d[1] == 0:
+            return None
+        return ({name: a / d[1] for name, a in t[0].items()}, t[1] / d[1])
+
+    return None
+
+
+def linear_atom(atom) -> Optional[LinearAtom]:
+    """
+    The normal form of an arithmetic atom (a <= b, a < b or a = b of pysmt),
+    or None if it is not a linear atom
+    """
+    if atom.is_le():
+        op = "<="
+    elif atom.is_lt():
+        op = "<"
+    elif atom.is_equals():
+        op = "="
+    else:
+        return None
+
+    left, right = linear_term(atom.arg(0)), linear_term(atom.arg(1))
+    if left is None or right is None:
+        return None
+    # left - right op 0
+    coeffs = dict(left[0])
+    for name, a in right[0].items():
+        coeffs[name] = coeffs.get(name, 0) - a
+    term = sorted((name, a) for name, a in coeffs.items() if a != 0)
+    bound = right[1] - left[1]
+    if not term:
+        return LinearAtom((), op, bound)
+
+    first = term[0][1]
+    if first < 0:
+        op = FLIPPED[op]
+    return LinearAtom(tuple((name, a / first) for name, a in term), op, bound / first)
@@ -0,0 +1,174 @@
+from typing import *
+
+import multiprocessing as mp
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import traceback
+
+from Theory import Theory
+from Portfolio import orphaned
+
+# the counters of the workers that are added to the stats of the search (see TheoryPool.totals)
+COUNTERS = ("theory_checks", "theory_conflicts", "cores", "core_literals", "minimized_core_literals")
+# useful checks in a row, per pending candidate, before the pipelined search lets one more candidate be pending
+# (see main.search_pipelined): where the candidates share their cores, it stays close to one
+STREAK = 16
+
+def diverting(pending: Iterable[tuple[int, ...]], weight: Sequence[int], flips: int = 2) -> list[int]:
+    """
+    Assumptions under which the SAT solver can not find any of the pending candidates again:
+    the negation of the flips literals of every candidate whose atoms were in the most cores so far
+    (weight[v] counts them), the ones most likely in the core of the candidate, so that the next model
+    does not share that core. Negating a single literal still lets the next model share most cores
+    of the pending candidates, more makes the search too narrow (the solver fails on the assumptions);
+    a candidate is skipped if an assumption excludes it already
+    """
+    assumed = set()
+    for key in pending:
+        if not key or any(-1 * lit in assumed for lit in key):
+            continue
+        free = sorted((lit for lit in key if lit not in assumed), key=lambda lit: -weight[abs(lit)])
+        for lit in free[:flips]:
+            assumed.add(-1 * lit)
+    return list(assumed)
+
+
+class TheoryPool:
+    """
+    Worker processes that check candidate models of the pipelined lazy search (see main.search_pipelined)
+    while the SAT solver looks for the next ones. A candidate is the projection of a Boolean model on the
+    theory atoms (a TheoryCache.key), its answer None if it is consistent and the conflict clause otherwise.
+    Every worker builds its theory solver once with make and keeps it warm for all of its checks
+    (z3 with the tracking literals of the atoms defined, or the simplex with the rows of all the terms).
+    A candidate is only submitted to an idle worker (see idle), so that the search can drop the candidates
+    that a core refutes while they wait, and knows the candidate of every worker: a worker that dies or fails
+    on its candidate is an error of results. The workers are forked, so make (and the atoms it closes over)
+    is not pickled, only the candidates and answers are.
+    Used as a context manager, which starts the workers and kills them again
+    """
+    def __init__(self, workers: int, make: Callable[[], Theory]):
+        self.workers = workers
+        self.make = make
+        self.processes = []
+        self.tasks = []
+        self.answers = None
+        self.previous = None
+        # worker -> the candidate it checks, or None if it is idle
+        self.busy = [None] * workers
+        # worker -> its last counters
+        self.counters = {}
+        self.submitted = 0
+        self.answered = 0
+
+    def __str__(self):
+        return f"TheoryPool(workers: {self.workers}, submitted: {self.submitted}, answered: {self.answered})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __enter__(self):
+        # a terminated run (eg. by timeout) still kills the workers
+        self.previous = signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+        ctx = mp.get_context("fork")
+        self.tasks = [ctx.SimpleQueue() for _ in range(self.workers)]
+        self.answers = ctx.Queue()
+        self.processes = [ctx.Process(target=self.worker, args=(i,), daemon=True) for i in range(self.workers)]
+        for p in self.processes:
+            p.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for p in self.processes:
+            p.kill()
+        for p in self.processes:
+            p.join()
+        signal.signal(signal.SIGTERM, self.previous)
+
+    def idle(self) -> int:
+        """
+        The number of workers without a candidate
+        """
+        return self.busy.count(None)
+
+    def submit(self, key: tuple[int, ...]):
+        """
+        Hands a candidate to an idle worker
+        """
+        i = self.busy.index(None)
+        self.busy[i] = key
+        self.tasks[i].put(key)
+        self.submitted += 1
+
+    def results(self, block: bool) -> list[tuple[tuple[int, ...], Optional[list[int]]]]:
+        """
+        The (candidate, answer) pairs that arrived since the last call, waits for one first if block is true.
+        Raises RuntimeError if a worker failed on its candidate, or died while it checked one
+        """
+        answers = []
+        if block:
+            while True:
+                try:
+                    answers.append(self.answers.get(timeout=0.1))
+                    break
+                except queue.Empty:
+                    for i, p in enumerate(self.processes):
+                        if self.busy[i] is not None and not p.is_alive() and self.answers.empty():
+                            raise RuntimeError(f"theory worker {i} died while it checked a candidate")
+        while True:
+            try:
+                answers.append(self.answers.get_nowait())
+            except queue.Empty:
+                break
+        self.answered += len(answers)
+        results = []
+        for i, key, answer, counters in answers:
+            if isinstance(answer, BaseException):
+                raise RuntimeError(f"theory worker {i} failed on a candidate") from answer
+            self.busy[i] = None
+            self.counters[i] = counters
+            results.append((key, answer))
+        return results
+
+    def totals(self) -> dict:
+        """
+        The counters of all the workers (see COUNTERS), as far as their answers told, with the checks
+        of their core minimizers and the CPU seconds of their checks (check_time)
+        """
+        totals = dict.fromkeys(COUNTERS + ("core_checks", "check_time"), 0)
+        for counters in self.counters.values():
+            for name, value in counters.items():
+                totals[name] += value
+        return totals
+
+    def worker(self, i: int):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        threading.Thread(target=orphaned, args=(os.getppid(),), daemon=True).start()
+        key = None
+        # CPU seconds, the wall clock also counts the time the other processes have the core
+        elapsed = 0.0
+        try:
+            with self.make() as tsolver:
+                stats = tsolver.stats
+                minimizer = getattr(tsolver, "minimizer", None)
+                while True:
+                    key = self.tasks[i].get()
+                    start = time.process_time()
+                    # one level per check, as in the sequential lazy search
+                    tsolver.push()
+                    for lit in key:
+                        tsolver.assert_lit(lit)
+                    conflict = tsolver.check(True)
+                    tsolver.pop(1)
+                    elapsed += time.process_time() - start
+                    counters = {name: getattr(stats, name) for name in COUNTERS}
+                    counters["core_checks"] = minimizer.checks if minimizer is not None else 0
+                    counters["check_time"] = elapsed
+                    self.answers.put((i, key, conflict, counters))
+        except Exception as e:
+            traceback.print_exc()
+            # the search would wait for the answer forever
+            self.answers.put((i, key, RuntimeError(f"{type(e).__name__}: {e}"), {}))
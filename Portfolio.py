@@ -0,0 +1,105 @@
+from typing import *
+
+import multiprocessing as mp
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import traceback
+
+from ClauseRing import ClauseRing, Share
+
+# the answer of a worker that gave up, every other answer wins
+UNKNOWN = "unknown"
+
+# diversified solver configurations (keyword arguments of cdcl.Solver), worker i > 0 runs CONFIGS[(i - 1) % len(CONFIGS)]
+# with seed i, worker 0 runs the default configuration so that the portfolio is never worse than a single solver
+CONFIGS = [
+    {"restart": "glucose", "phase": False, "var_decay": 0.95},
+    {"restart": "luby", "phase": False, "var_decay": 0.8},
+    {"restart": "glucose", "phase": True, "var_decay": 0.99},
+    {"restart": "luby", "phase": True, "var_decay": 0.9},
+    {"restart": "glucose", "phase": True, "var_decay": 0.8},
+    {"restart": "luby", "phase": False, "var_decay": 0.99},
+]
+
+def configs(workers: int, restart: str = "luby") -> list[dict]:
+    """
+    The configurations of the workers, the first one with the given restart policy and no seed
+    """
+    return [{"restart": restart, "seed": None, "phase": True, "var_decay": 0.95}] + \
+           [dict(CONFIGS[(i - 1) % len(CONFIGS)], seed=i) for i in range(1, workers)]
+
+
+class Portfolio:
+    """
+    Runs the same search in worker processes with different solver configurations, the first answer wins
+    and the other workers are killed. The workers are forked, so the search (and the clause set it closes over)
+    is not pickled, only the answers are. With share the workers exchange their learned clauses of LBD <= share_lbd
+    through a shared memory ClauseRing
+    """
+    def __init__(self, workers: int, restart: str = "luby", share: bool = True, share_lbd: int = 3, ring_size: int = 1 << 16):
+        self.configs = configs(workers, restart)
+        self.share = share
+        self.share_lbd = share_lbd
+        self.ring_size = ring_size
+
+    def run(self, search: Callable[[dict, Optional[Share]], Any]) -> (Optional[int], Any):
+        """
+        Calls search(config, share) in every worker, where config holds the keyword arguments of cdcl.Solver.
+        Returns the worker that answered first and its answer, or (None, UNKNOWN) if no worker could answer
+        """
+        # a terminated run (eg. by timeout) still kills the workers and frees the ring
+        previous = signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+        ctx = mp.get_context("fork")
+        ring = ClauseRing(self.ring_size, ctx.Lock()) if self.share else None
+        answers = ctx.Queue()
+        workers = [ctx.Process(target=self.worker, args=(search, i, config, ring, answers), daemon=True)
+                   for i, config in enumerate(self.configs)]
+        try:
+            for p in workers:
+                p.start()
+            pending = len(workers)
+            while pending > 0:
+                try:
+                    i, answer = answers.get(timeout=0.1)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in workers) and answers.empty():
+                        # the rest died without an answer
+                        break
+                    continue
+                pending -= 1
+                if not (isinstance(answer, str) and answer == UNKNOWN):
+                    return (i, answer)
+            return (None, UNKNOWN)
+        finally:
+            for p in workers:
+                p.kill()
+            for p in workers:
+                p.join()
+            if ring is not None:
+                ring.close(unlink=True)
+            signal.signal(signal.SIGTERM, previous)
+
+    def worker(self, search, i: int, config: dict, ring: Optional[ClauseRing], answers):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        parent = os.getppid()
+        threading.Thread(target=orphaned, args=(parent,), daemon=True).start()
+        share = Share(ring, i, self.share_lbd) if ring is not None else None
+        try:
+            answer = search(config, share)
+        except Exception:
+            traceback.print_exc()
+            answer = UNKNOWN
+        answers.put((i, answer))
+
+
+def orphaned(parent: int):
+    """
+    Exits a worker whose portfolio process is gone (killed before it could kill the workers)
+    """
+    while os.getppid() == parent:
+        time.sleep(1)
+    os._exit(1)
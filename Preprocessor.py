@@ -0,0 +1,380 @@
+from typing import *
+
+class Preprocessor:
+    """
+    SatELite style CNF preprocessing that runs before search:
+    unit propagation at level 0, backward subsumption, strengthening (self-subsuming resolution)
+    equivalent literal substitution and bounded variable elimination.
+    occurs[lit] holds the clauses lit is in, indexed by literal like the model (-lit wraps around).
+    Frozen variables (eg. theory atoms, which the theory solver has to see) are never eliminated.
+    A variable is eliminated by replacing the clauses it is in with their non-tautological resolvents,
+    only if that does not add clauses and no resolvent is longer than max_resolvent; elimination
+    with no resolvents also removes pure literals. The removed clauses are kept on a stack, extend
+    uses them to give the eliminated variables values that satisfy the original clauses.
+    Equivalent literals are the strongly connected components of the binary implication graph,
+    every component is replaced by one representative literal (substitution[v] is the literal v is replaced by).
+    A frozen variable is never substituted, it is the representative of its component if it can be.
+    """
+    def __init__(self, literals: int, clauses: Iterable[Sequence[int]], frozen: Iterable[int] = (),
+                 max_occurrences: int = 16, max_resolvent: int = 20):
+        self.size = literals
+        self.max_occurrences = max_occurrences
+        self.max_resolvent = max_resolvent
+
+        self.clauses = []
+        self.signature = []
+        self.occurs = [set() for _ in range(2 * literals + 1)]
+        self.value = [0] * (literals + 1)
+        self.frozen = bytearray(literals + 1)
+        for v in frozen:
+            self.frozen[abs(v)] = 1
+        self.eliminated = bytearray(literals + 1)
+        self.substitution = {}
+        # the original variable of every variable after renumber (None until then)
+        self.variables = None
+        # (literal, clause) pairs of the eliminated variables, in order of elimination
+        self.stack = []
+
+        self.units = []
+        # clauses to check for backward subsumption
+        self.queue = []
+        self.unsat = False
+
+        self.subsumed = 0
+        self.strengthened = 0
+        self.resolved = 0
+        self.substituted = 0
+
+        for clause in clauses:
+            self.add(clause)
+
+    def __str__(self):
+        return f"Preprocessor(clauses: {len(self.clauses) - self.clauses.count(None)}, fixed: {self.size - self.value.count(0) + 1}, " \
+               f"eliminated: {sum(self.eliminated)}, substituted: {self.substituted}, subsumed: {self.subsumed}, strengthened: {self.strengthened})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def add(self, clause: Sequence[int]):
+        """
+        Adds a clause, simplified by the fixed literals
+        """
+        literals = []
+        for lit in dict.fromkeys(int(lit) for lit in clause):
+            v = self.value[abs(lit)]
+            if v == lit or -1 * lit in literals:
+                # satisfied or a tautology
+                return
+            if v == 0:
+                literals.append(lit)
+
+        if len(literals) == 0:
+            self.unsat = True
+            return
+        if len(literals) == 1:
+            self.units.append(literals[0])
+            return
+
+        c = len(self.clauses)
+        self.clauses.append(literals)
+        sig = 0
+        for lit in literals:
+            self.occurs[lit].add(c)
+            sig |= 1 << (abs(lit) & 63)
+        self.signature.append(sig)
+        self.queue.append(c)
+
+    def remove(self, c: int):
+        for lit in self.clauses[c]:
+            self.occurs[lit].discard(c)
+        self.clauses[c] = None
+
+    def strengthen(self, c: int, lit: int):
+        """
+        Removes a (false or redundant) literal from a clause
+        """
+        clause = self.clauses[c]
+        clause.remove(lit)
+        self.occurs[lit].discard(c)
+        sig = 0
+        for q in clause:
+            sig |= 1 << (abs(q) & 63)
+        self.signature[c] = sig
+        if len(clause) == 1:
+            self.units.append(clause[0])
+            self.remove(c)
+        else:
+            self.queue.append(c)
+
+    def propagate(self) -> bool:
+        """
+        Assigns the unit literals at level 0, removing the satisfied clauses and the false literals.
+        Returns False if the clauses are unsat
+        """
+        value, occurs = self.value, self.occurs
+        while self.units and not self.unsat:
+            lit = self.units.pop()
+            if value[abs(lit)] == lit:
+                continue
+            if value[abs(lit)] == -1 * lit:
+                self.unsat = True
+                break
+            value[abs(lit)] = lit
+            for c in list(occurs[lit]):
+                self.remove(c)
+            for c in list(occurs[-1 * lit]):
+                if len(self.clauses[c]) == 2:
+                    # the other literal is implied
+                    other = self.clauses[c][0] if self.clauses[c][1] == -1 * lit else self.clauses[c][1]
+                    self.units.append(other)
+                    self.remove(c)
+                else:
+                    self.strengthen(c, -1 * lit)
+        return not self.unsat
+
+    def subsume(self, c: int):
+        """
+        Removes the clauses that clause c subsumes, and strengthens the clauses
+        it subsumes with one literal negated (self-subsuming resolution)
+        """
+        clause = self.clauses[c]
+        occurs, clauses = self.occurs, self.clauses
+        sig = self.signature[c]
+        # every clause it subsumes has the variable with the fewest occurrences
+        best = min(clause, key=lambda lit: len(occurs[lit]) + len(occurs[-1 * lit]))
+        for d in list(occurs[best]) + list(occurs[-1 * best]):
+            other = clauses[d]
+            if d == c or other is None or len(other) < len(clause) or sig & ~self.signature[d]:
+                continue
+            others = set(other)
+            negated = 0
+            for lit in clause:
+                if lit in others:
+                    continue
+                if negated == 0 and -1 * lit in others:
+                    negated = lit
+                    continue
+                break
+            else:
+                if negated == 0:
+                    self.subsumed += 1
+                    self.remove(d)
+                else:
+                    self.strengthened += 1
+                    self.strengthen(d, -1 * negated)
+
+    def components(self) -> list[list[int]]:
+        """
+        Strongly connected components of the binary implication graph (a clause [a, b] is the edges
+        -a -> b and -b -> a) that have more than one literal, by Tarjan's algorithm with an explicit stack
+        """
+        graph = {}
+        for clause in self.clauses:
+            if clause is not None and len(clause) == 2:
+                a, b = clause
+                graph.setdefault(-1 * a, []).append(b)
+                graph.setdefault(-1 * b, []).append(a)
+
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root in graph:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(graph[root]))]
+            while work:
+                node, edges = work[-1]
+                for w in edges:
+                    if w not in index:
+                        index[w] = low[w] = len(index)
+                        stack.append(w)
+                        on_stack.add(w)
+                        work.append((w, iter(graph.get(w, ()))))
+                        break
+                    if w in on_stack:
+                        low[node] = min(low[node], index[w])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            w = stack.pop()
+                            on_stack.discard(w)
+                            component.append(w)
+                            if w == node:
+                                break
+                        if len(component) > 1:
+                            components.append(component)
+        return components
+
+    def substitute(self) -> int:
+        """
+        Replaces equivalent literals by the representative of their component.
+        Returns the number of substituted variables (0 if the clauses are found unsat, x and -x are equivalent)
+        """
+        substitution, frozen = {}, self.frozen
+        done = set()
+        for component in self.components():
+            # the component of the negated literals has the same variables, only one of the two is used
+            if abs(component[0]) in done:
+                continue
+            lits = set(component)
+            if any(-1 * lit in lits for lit in component):
+                self.unsat = True
+                return 0
+            done.update(abs(lit) for lit in component)
+            rep = min(component, key=lambda lit: (not frozen[abs(lit)], abs(lit)))
+            for lit in component:
+                if lit != rep and not frozen[abs(lit)]:
+                    substitution[abs(lit)] = rep if lit > 0 else -1 * rep
+        if not substitution:
+            return 0
+
+        changed = set()
+        for v in substitution:
+            changed |= self.occurs[v] | self.occurs[-1 * v]
+        rewritten = []
+        for c in changed:
+            rewritten.append([substitution.get(lit, lit) if lit > 0 else -1 * substitution.get(-1 * lit, -1 * lit)
+                              for lit in self.clauses[c]])
+            self.remove(c)
+        for v, r in substitution.items():
+            # v <-> r, v gets the value of r back in extend
+            self.stack.append((v, [v, -1 * r]))
+            self.stack.append((-1 * v, [-1 * v, r]))
+            self.eliminated[v] = 1
+        self.substitution.update(substitution)
+        self.substituted += len(substitution)
+        for clause in rewritten:
+            self.add(clause)
+        return len(substitution)
+
+    def eliminate(self, v: int) -> bool:
+        """
+        Eliminates a variable by resolution if that does not add clauses
+        """
+        occurs, clauses = self.occurs, self.clauses
+        pos, neg = list(occurs[v]), list(occurs[-1 * v])
+        if len(pos) + len(neg) > self.max_occurrences and len(pos) > 0 and len(neg) > 0:
+            return False
+
+        resolvents = []
+        limit = len(pos) + len(neg)
+        for p in pos:
+            for n in neg:
+                resolvent = [lit for lit in clauses[p] if lit != v]
+                present = set(resolvent)
+                for lit in clauses[n]:
+                    if lit == -1 * v or lit in present:
+                        continue
+                    if -1 * lit in present:
+                        break
+                    resolvent.append(lit)
+                    present.add(lit)
+                else:
+                    if len(resolvent) > self.max_resolvent or len(resolvents) >= limit:
+                        return False
+                    resolvents.append(resolvent)
+
+        for c in pos:
+            self.stack.append((v, clauses[c]))
+            self.remove(c)
+        for c in neg:
+            self.stack.append((-1 * v, clauses[c]))
+            self.remove(c)
+        self.eliminated[v] = 1
+        self.resolved += len(resolvents)
+        for resolvent in resolvents:
+            self.add(resolvent)
+        return True
+
+    def run(self) -> bool:
+        """
+        Runs propagation, subsumption and elimination until none of them changes anything.
+        Returns False if the clauses are unsat
+        """
+        occurs = self.occurs
+        while True:
+            if not self.propagate():
+                return False
+
+            while self.queue:
+                c = self.queue.pop()
+                if self.clauses[c] is not None:
+                    self.subsume(c)
+                if self.units and not self.propagate():
+                    return False
+
+            if self.substitute():
+                # the rewritten clauses go through propagation and subsumption again first
+                continue
+            if self.unsat:
+                return False
+
+            candidates = [v for v in range(1, self.size + 1)
+                          if not (self.frozen[v] or self.eliminated[v] or self.value[v]) and (occurs[v] or occurs[-1 * v])]
+            candidates.sort(key=lambda v: len(occurs[v]) * len(occurs[-1 * v]))
+            changed = False
+            for v in candidates:
+                # a pending unit is not in the occurrence lists, it has to be assigned before its variable goes
+                if self.units and not self.propagate():
+                    return False
+                if not self.eliminated[v] and self.value[v] == 0 and self.eliminate(v):
+                    changed = True
+                if self.unsat:
+                    return False
+            if not changed and not self.units and not self.queue:
+                return True
+
+    def to_list(self) -> list[list[int]]:
+        """
+        The remaining clauses, and the fixed literals as unit clauses
+        """
+        clauses = [clause for clause in self.clauses if clause is not None]
+        clauses.extend([lit] for lit in self.value if lit != 0)
+        return clauses
+
+    def renumber(self) -> (list[list[int]], list[int]):
+        """
+        Numbers the variables that are left 1..n, so that the solver does not carry the eliminated,
+        substituted and fixed ones. Frozen variables are always kept (fixed ones as unit clauses).
+        Returns the clauses and the original variable of every new one (variables[0] is 0)
+        """
+        occurs, value, frozen = self.occurs, self.value, self.frozen
+        self.variables = [0] + [v for v in range(1, self.size + 1)
+                                if frozen[v] or (not self.eliminated[v] and value[v] == 0 and (occurs[v] or occurs[-1 * v]))]
+        new = {v: i for i, v in enumerate(self.variables)}
+        clauses = [[new[lit] if lit > 0 else -1 * new[-1 * lit] for lit in clause] for clause in self.clauses if clause is not None]
+        clauses.extend([new[v] if value[v] > 0 else -1 * new[v]] for v in self.variables if value[v] != 0)
+        return (clauses, self.variables)
+
+    def extend(self, model: Sequence[int]) -> list[int]:
+        """
+        Gives the eliminated variables values that satisfy the clauses they were removed with,
+        going back from the last eliminated variable. model is a complete assignment of the preprocessed
+        clauses (in the numbering of renumber if it was called)
+        """
+        value = list(self.value)
+        if self.variables is None:
+            for lit in model:
+                value[abs(lit)] = lit
+        else:
+            for lit in model:
+                v = self.variables[abs(lit)]
+                value[v] = v if lit > 0 else -1 * v
+            # variables in no clause get any value
+            for v in range(1, self.size + 1):
+                if value[v] == 0:
+                    value[v] = v
+        for lit, clause in reversed(self.stack):
+            if not any(value[abs(q)] == q for q in clause):
+                value[abs(lit)] = lit
+        return [lit for lit in value[1:]]
@@ -0,0 +1,108 @@
+from typing import *
+
+"""
+Restart policies for the CDCL loop.
+The solver calls on_conflict after every learned clause (with its LBD, ie. the number of distinct
+decision levels in it), asks should_restart before every decision, and calls restarted after it
+backjumped to level 0.
+"""
+
+def luby(y: float, x: int) -> float:
+    """
+    Returns y^k where k is the x-th (0-indexed) element of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ...
+    Taken from MiniSat
+    """
+    size, seq = 1, 0
+    while size < x + 1:
+        seq += 1
+        size = 2 * size + 1
+
+    while size - 1 != x:
+        size = (size - 1) >> 1
+        seq -= 1
+        x = x % size
+
+    return y ** seq
+
+
+class NoRestart:
+    """
+    Never restarts
+    """
+    def on_conflict(self, lbd: int):
+        pass
+
+    def should_restart(self) -> bool:
+        return False
+
+    def restarted(self):
+        pass
+
+
+class LubyRestart(NoRestart):
+    """
+    Restarts after unit * luby(i) conflicts for the i-th restart
+    """
+    def __init__(self, unit: int = 100):
+        self.unit = unit
+        self.restarts = 0
+        self.conflicts = 0
+        self.limit = unit * luby(2, 0)
+
+    def on_conflict(self, lbd: int):
+        self.conflicts += 1
+
+    def should_restart(self) -> bool:
+        return self.conflicts >= self.limit
+
+    def restarted(self):
+        self.restarts += 1
+        self.conflicts = 0
+        self.limit = self.unit * luby(2, self.restarts)
+
+
+class GlucoseRestart(NoRestart):
+    """
+    Glucose style restarts with exponential moving averages of the LBD of learned clauses:
+    restarts when the recent (fast) average is margin times worse than the long term (slow) one,
+    ie. when the clauses that are learned lately are of worse quality than usual
+    """
+    def __init__(self, fast: float = 1/32, slow: float = 1/4096, margin: float = 1.25, min_conflicts: int = 50):
+        self.fast_alpha = fast
+        self.slow_alpha = slow
+        self.margin = margin
+        self.min_conflicts = min_conflicts
+        self.fast = 0.0
+        self.slow = 0.0
+        self.conflicts = 0
+        self.restarts = 0
+
+    def on_conflict(self, lbd: int):
+        if self.conflicts == 0 and self.restarts == 0:
+            # start both averages at the first LBD instead of 0
+            self.fast = self.slow = float(lbd)
+        self.conflicts += 1
+        self.fast += self.fast_alpha * (lbd - self.fast)
+        self.slow += self.slow_alpha * (lbd - self.slow)
+
+    def should_restart(self) -> bool:
+        return self.conflicts >= self.min_conflicts and self.fast > self.margin * self.slow
+
+    def restarted(self):
+        self.restarts += 1
+        self.conflicts = 0
+
+
+RESTART_POLICIES = {
+    "none": NoRestart,
+    "luby": LubyRestart,
+    "glucose": GlucoseRestart,
+}
+
+def make_restart_policy(name: str):
+    """
+    Returns a new restart policy by its name (one of RESTART_POLICIES)
+    """
+    if name not in RESTART_POLICIES:
+        raise ValueError(f"unknown restart policy: {name}, expected one of {list(RESTART_POLICIES)}")
+    return RESTART_POLICIES[name]()
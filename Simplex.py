@@ -0,0 +1,348 @@
+from typing import *
+
+from fractions import Fraction
+
+class Simplex:
+    """
+    General simplex of Dutertre and de Moura (A Fast Linear-Arithmetic Solver for DPLL(T), CAV 2006)
+    for conjunctions of linear atoms over the reals.
+    Every linear term of more than one variable gets a slack variable that is basic in a row x_i = sum a_ij x_j
+    of the tableau, and the atoms are bounds on the variables. Strict bounds are delta-rationals c + k*delta,
+    stored as pairs (c, k): x < 3 is the bound x <= (3, -1).
+    Asserting a bound is O(1) (plus moving a nonbasic variable onto it), and backtracking only restores the
+    bounds from the bound trail: the assignment always satisfies the rows, and stays within the looser bounds
+    of a lower level. Disequalities (negated equalities) are only looked at in final checks, where the search
+    splits them into x < c or x > c.
+    Every bound carries the literal that asserted it, so an inconsistency is explained by the literals of the
+    bounds of one row, or of the two bounds of one variable.
+    With exact, the numbers are Fractions, otherwise floats that are compared up to eps
+    """
+    def __init__(self, exact: bool = True, eps: float = 1e-9):
+        self.exact = exact
+        self.num = Fraction if exact else float
+        self.eps = 0 if exact else eps
+        self.zero = self.num(0)
+        # basic variable -> {nonbasic variable: coefficient}
+        self.rows = {}
+        # variable -> the basic variables with the variable in their row
+        self.cols = []
+        # variable -> (c, k)
+        self.value = []
+        # variable -> None or (c, k, literal)
+        self.lower = []
+        self.upper = []
+        # (variable, constant, literal) of the asserted disequalities
+        self.disequal = []
+        # (variable, True for upper / False for lower / None for a disequality, old bound), and where each level starts in it
+        self.trail = []
+        self.trail_lim = []
+        self.names = {}
+        self.slacks = {}
+        # the first conflict of an assertion, until the level it was asserted on is popped
+        self.conflict = None
+        self.conflict_level = 0
+        self.pivots = 0
+
+    def __len__(self):
+        return len(self.value)
+
+    def __str__(self):
+        return f"Simplex(vars: {len(self.value)}, rows: {len(self.rows)}, pivots: {self.pivots})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def less(self, a, b) -> bool:
+        """
+        a < b for delta-rationals (or bounds, whose literal is ignored)
+        """
+        d = a[0] - b[0]
+        if d < -self.eps:
+            return True
+        if d > self.eps:
+            return False
+        return a[1] < b[1]
+
+    def new_var(self) -> int:
+        self.value.append((self.zero, self.zero))
+        self.lower.append(None)
+        self.upper.append(None)
+        self.cols.append(set())
+        return len(self.value) - 1
+
+    def variable(self, name: str) -> int:
+        x = self.names.get(name)
+        if x is None:
+            x = self.names[name] = self.new_var()
+        return x
+
+    def term(self, term: Sequence[tuple[str, Fraction]]) -> int:
+        """
+        The variable of a linear term (see LinearAtom): the variable itself for 1 x,
+        the slack variable of the term otherwise (added as a row the first time)
+        """
+        if len(term) == 1:
+            return self.variable(term[0][0])
+        s = self.slacks.get(term)
+        if s is not None:
+            return s
+
+        rows, num = self.rows, self.num
+        row = {}
+        for name, a in term:
+            x = self.variable(name)
+            if x in rows:
+                # the basic variables are replaced by their rows
+                for j, b in rows[x].items():
+                    row[j] = row.get(j, self.zero) + num(a) * b
+            else:
+                row[x] = row.get(x, self.zero) + num(a)
+
+        s = self.slacks[term] = self.new_var()
+        row = {j: a for j, a in row.items() if abs(a) > self.eps}
+        rows[s] = row
+        c = k = self.zero
+        for j, a in row.items():
+            self.cols[j].add(s)
+            c += a * self.value[j][0]
+            k += a * self.value[j][1]
+        self.value[s] = (c, k)
+        return s
+
+    def push(self):
+        self.trail_lim.append(len(self.trail))
+
+    def pop(self, levels: int):
+        trail, lower, upper = self.trail, self.lower, self.upper
+        start = self.trail_lim[-levels]
+        for i in range(len(trail) - 1, start - 1, -1):
+            x, is_upper, old = trail[i]
+            if is_upper is None:
+                self.disequal.pop()
+            elif is_upper:
+                upper[x] = old
+            else:
+                lower[x] = old
+        del trail[start:]
+        del self.trail_lim[-levels:]
+        if self.conflict is not None and len(self.trail_lim) < self.conflict_level:
+            self.conflict = None
+
+    def assert_relation(self, x: int, op: str, c: Fraction, lit: int) -> Optional[list[int]]:
+        """
+        Asserts x op c (the relation of an atom over the term of x, or the negated one for a negative literal).
+        Returns the literals of the conflicting bounds if the new bound contradicts one that is asserted already,
+        the next check returns them as well
+        """
+        if not self.exact:
+            c = float(c)
+        if op == "<=":
+            core = self.assert_upper(x, c, 0, lit)
+        elif op == "<":
+            core = self.assert_upper(x, c, -1, lit)
+        elif op == ">=":
+            core = self.assert_lower(x, c, 0, lit)
+        elif op == ">":
+            core = self.assert_lower(x, c, 1, lit)
+        elif op == "=":
+            core = self.assert_upper(x, c, 0, lit) or self.assert_lower(x, c, 0, lit)
+        else:
+            self.disequal.append((x, c, lit))
+            self.trail.append((x, None, None))
+            core = None
+        if core is not None and self.conflict is None:
+            self.conflict = core
+            self.conflict_level = len(self.trail_lim)
+        return core
+
+    def assert_upper(self, x: int, c, k, lit: int) -> Optional[list[int]]:
+        bound = (c, k, lit)
+        u, l = self.upper[x], self.lower[x]
+        if u is not None and not self.less(bound, u):
+            return None
+        if l is not None and self.less(bound, l):
+            return [lit, l[2]]
+        self.trail.append((x, True, u))
+        self.upper[x] = bound
+        if x not in self.rows and self.less(bound, self.value[x]):
+            self.update(x, bound[:2])
+        return None
+
+    def assert_lower(self, x: int, c, k, lit: int) -> Optional[list[int]]:
+        bound = (c, k, lit)
+        u, l = self.upper[x], self.lower[x]
+        if l is not None and not self.less(l, bound):
+            return None
+        if u is not None and self.less(u, bound):
+            return [lit, u[2]]
+        self.trail.append((x, False, l))
+        self.lower[x] = bound
+        if x not in self.rows and self.less(self.value[x], bound):
+            self.update(x, bound[:2])
+        return None
+
+    def entailed(self, x: int, op: str, c) -> Optional[list[int]]:
+        """
+        Returns the literals of the bounds of x that entail x op c, or None if they do not
+        """
+        l, u = self.lower[x], self.upper[x]
+        if not self.exact:
+            c = float(c)
+        if op == "<=" or op == "<":
+            if u is not None and not self.less((c, 0 if op == "<=" else -1), u):
+                return [u[2]]
+        elif op == ">=" or op == ">":
+            if l is not None and not self.less(l, (c, 0 if op == ">=" else 1)):
+                return [l[2]]
+        elif op == "=":
+            if u is not None and l is not None and not self.less((c, 0), u) and not self.less(l, (c, 0)):
+                return list(dict.fromkeys((l[2], u[2])))
+        else:
+            if u is not None and self.less(u, (c, 0)):
+                return [u[2]]
+            if l is not None and self.less((c, 0), l):
+                return [l[2]]
+        return None
+
+    def update(self, x: int, v: tuple):
+        """
+        Moves the nonbasic variable x to v, and the basic variables of its column with it
+        """
+        value, rows = self.value, self.rows
+        dc, dk = v[0] - value[x][0], v[1] - value[x][1]
+        for i in self.cols[x]:
+            a = rows[i][x]
+            c, k = value[i]
+            value[i] = (c + a * dc, k + a * dk)
+        value[x] = v
+
+    def pivot(self, r: int, s: int):
+        """
+        Swaps the basic variable r with the nonbasic variable s of its row
+        """
+        rows, cols, eps = self.rows, self.cols, self.eps
+        row = rows.pop(r)
+        inv = 1 / row.pop(s)
+        for j in row:
+            cols[j].discard(r)
+        cols[s].discard(r)
+
+        new = {j: -1 * b * inv for j, b in row.items()}
+        new[r] = inv
+        for i in cols[s]:
+            ri = rows[i]
+            b = ri.pop(s)
+            for j, a in new.items():
+                x = ri.get(j, self.zero) + b * a
+                if abs(x) > eps:
+                    ri[j] = x
+                    cols[j].add(i)
+                elif j in ri:
+                    del ri[j]
+                    cols[j].discard(i)
+        cols[s] = set()
+        rows[s] = new
+        for j in new:
+            cols[j].add(s)
+        self.pivots += 1
+
+    def pivot_and_update(self, r: int, s: int, v: tuple):
+        """
+        Moves the basic variable r to v by moving the nonbasic s, then pivots them
+        """
+        value, rows = self.value, self.rows
+        a = rows[r][s]
+        dc, dk = (v[0] - value[r][0]) / a, (v[1] - value[r][1]) / a
+        value[r] = v
+        value[s] = (value[s][0] + dc, value[s][1] + dk)
+        for i in self.cols[s]:
+            if i != r:
+                b = rows[i][s]
+                c, k = value[i]
+                value[i] = (c + b * dc, k + b * dk)
+        self.pivot(r, s)
+
+    def check(self, final: bool = False) -> Optional[list[int]]:
+        """
+        Searches an assignment within the bounds (and, if final, off the disequalities).
+        Returns None if there is one, otherwise the literals of the bounds that contradict each other
+        """
+        if self.conflict is not None:
+            return self.conflict
+        rows, value, lower, upper, less = self.rows, self.value, self.lower, self.upper, self.less
+        while True:
+            # Bland's rule: the smallest variable out of its bounds, and the smallest one to fix it with
+            x = None
+            for i in rows:
+                if (x is None or i < x) and ((lower[i] is not None and less(value[i], lower[i]))
+                                             or (upper[i] is not None and less(upper[i], value[i]))):
+                    x = i
+            if x is None:
+                break
+
+            row = rows[x]
+            increase = lower[x] is not None and less(value[x], lower[x])
+            s = None
+            for j, a in row.items():
+                if (a > 0) == increase:
+                    slack = upper[j] is None or less(value[j], upper[j])
+                else:
+                    slack = lower[j] is None or less(lower[j], value[j])
+                if slack and (s is None or j < s):
+                    s = j
+            if s is None:
+                # the row can not move x into its bounds, every variable of it is at the bound in the way
+                core = [lower[x][2] if increase else upper[x][2]]
+                for j, a in row.items():
+                    core.append(upper[j][2] if (a > 0) == increase else lower[j][2])
+                return list(dict.fromkeys(core))
+            self.pivot_and_update(x, s, (lower[x] if increase else upper[x])[:2])
+
+        if final and self.disequal:
+            return self.split()
+        return None
+
+    def split(self) -> Optional[list[int]]:
+        """
+        Checks the two sides x < c and x > c of a disequality that the assignment violates.
+        The core of an inconsistent disequality is the union of the cores of both sides
+        """
+        for x, c, lit in self.disequal:
+            v = self.value[x]
+            if abs(v[0] - c) <= self.eps and abs(v[1]) <= self.eps:
+                break
+        else:
+            return None
+
+        cores = []
+        for is_upper in (True, False):
+            self.push()
+            if is_upper:
+                core = self.assert_upper(x, c, -1, lit) or self.check(True)
+            else:
+                core = self.assert_lower(x, c, 1, lit) or self.check(True)
+            # the assignment of a consistent side is within the bounds that are left after the pop
+            self.pop(1)
+            if core is None:
+                return None
+            cores.extend(core)
+        return list(dict.fromkeys(cores))
+
+    def model(self) -> dict:
+        """
+        The values of the (named) variables of a consistent assignment, with a delta that is small enough
+        for every bound and disequality
+        """
+        value, lower, upper, disequal = self.value, self.lower, self.upper, self.disequal
+        delta = self.num(1)
+        for x, (c, k) in enumerate(value):
+            l, u = lower[x], upper[x]
+            if l is not None and l[0] < c and l[1] > k:
+                delta = min(delta, (c - l[0]) / (l[1] - k))
+            if u is not None and c < u[0] and k > u[1]:
+                delta = min(delta, (u[0] - c) / (k - u[1]))
+        for x, c, lit in disequal:
+            v = value[x]
+            if v[1] != 0 and 0 < (c - v[0]) / v[1] <= delta:
+                delta = (c - v[0]) / v[1] / 2
+        return {name: value[x][0] + value[x][1] * delta for name, x in self.names.items()}
@@ -0,0 +1,180 @@
+from typing import *
+
+import hashlib
+import io
+import mmap
+import os
+
+import numpy as np
+from pysmt.smtlib.parser import SmtLibParser
+from pysmt.smtlib.script import SmtLibScript
+
+from Theory import is_theory_atom, shared_symbols
+
+# bumped whenever the layout of the cache files changes
+VERSION = b"skeleton-2"
+
+def content_hash(fpath: str, tag: str = "") -> str:
+    """
+    sha256 of the contents of a file (and the cache version and tag)
+    """
+    h = hashlib.sha256(VERSION + tag.encode())
+    with open(fpath, "rb") as f:
+        if os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                h.update(data)
+    return h.hexdigest()
+
+
+class Atoms:
+    """
+    The atom map and its inverse of a cached skeleton (see main.build_skeleton_map),
+    which are parsed from the cached SMT-LIB script the first time they are used.
+    After preprocessing renumbers the variables, the ids go through the substitution table
+    variables (variables[i] is the old id of atom i, see Preprocessor.renumber)
+    """
+    def __init__(self, fpath: Optional[str]):
+        self.fpath = fpath
+        self.maps = None
+        self.variables = None
+
+    @staticmethod
+    def of(atom_map: dict, atom_rev: dict):
+        """
+        Wraps atom maps that are already built
+        """
+        atoms = Atoms(None)
+        atoms.maps = (atom_map, atom_rev)
+        return atoms
+
+    def renumber(self, variables: Sequence[int]):
+        """
+        Keeps the atoms of the variables that are left after preprocessing, with their new ids
+        """
+        if self.maps is not None:
+            self.maps = Atoms.substitute(self.maps[1], variables)
+        else:
+            self.variables = variables
+
+    @staticmethod
+    def substitute(atom_rev: dict, variables: Sequence[int]) -> (dict, dict):
+        atom_map = {}
+        new_rev = {}
+        for i in range(1, len(variables)):
+            atom = atom_rev[variables[i]]
+            atom_map[atom] = i
+            new_rev[i] = atom
+        return (atom_map, new_rev)
+
+    def load(self) -> (dict, dict):
+        if self.maps is None:
+            with open(self.fpath, "r", encoding="utf-8") as f:
+                script = SmtLibParser().get_script(f)
+            atom_map = {}
+            atom_rev = {}
+            for i, cmd in enumerate(script.filter_by_command_name("assert"), 1):
+                atom_map[cmd.args[0]] = i
+                atom_rev[i] = cmd.args[0]
+            self.maps = (atom_map, atom_rev) if self.variables is None else Atoms.substitute(atom_rev, self.variables)
+        return self.maps
+
+    @property
+    def atom_map(self) -> dict:
+        return self.load()[0]
+
+    @property
+    def atom_rev(self) -> dict:
+        return self.load()[1]
+
+
+class Skeleton:
+    """
+    A boolean skeleton as loaded from the cache: the clauses in CSR form (clause i is
+    lits[offsets[i]:offsets[i + 1]]), theory[v] is 1 iff atom v is an arithmetic atom,
+    and the atoms themselves
+    """
+    def __init__(self, size: int, theory: np.ndarray, offsets: np.ndarray, lits: np.ndarray, atoms: Atoms):
+        self.size = size
+        self.theory = theory
+        self.offsets = offsets
+        self.lits = lits
+        self.atoms = atoms
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def clauses(self) -> list[list[int]]:
+        offsets = self.offsets.tolist()
+        lits = self.lits.tolist()
+        return [lits[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+class SkeletonCache:
+    """
+    On-disk cache of the boolean skeletons of SMT-LIB files, keyed on the hash of the file contents.
+    Every entry is two files in the cache directory:
+      <hash>.npy    one int32 array [size, clauses, theory flags (size + 1), offsets (clauses + 1), literals],
+                    loaded with a single memory mapped read
+      <hash>.smt2   the atoms in the order of their ids, as SMT-LIB assertions
+    tag tells apart skeletons of the same file that are built differently (eg. by another front-end)
+    """
+    def __init__(self, directory: str, tag: str = ""):
+        self.directory = directory
+        self.tag = tag
+
+    def paths(self, digest: str) -> (str, str):
+        base = os.path.join(self.directory, digest)
+        return (base + ".npy", base + ".smt2")
+
+    def load(self, fpath: str) -> Optional[Skeleton]:
+        """
+        Returns the cached skeleton of the file, or None if it is not in the cache
+        """
+        array_path, atoms_path = self.paths(content_hash(fpath, self.tag))
+        if not (os.path.exists(array_path) and os.path.exists(atoms_path)):
+            return None
+
+        data = np.load(array_path, mmap_mode="r")
+        size, clauses = int(data[0]), int(data[1])
+        theory = data[2:size + 3]
+        offsets = data[size + 3:size + clauses + 4]
+        lits = data[size + clauses + 4:]
+        return Skeleton(size, theory, offsets, lits, Atoms(atoms_path))
+
+    def store(self, fpath: str, skeleton: list[list[int]], atom_rev: dict):
+        """
+        Writes the skeleton and the atoms of the file to the cache
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        array_path, atoms_path = self.paths(content_hash(fpath, self.tag))
+
+        size = len(atom_rev)
+        theory = [0] * (size + 1)
+        shared = shared_symbols(atom_rev.values())
+        for i, atom in atom_rev.items():
+            theory[i] = int(is_theory_atom(atom, shared))
+        offsets = np.zeros(len(skeleton) + 1, dtype=np.int32)
+        np.cumsum([len(clause) for clause in skeleton], out=offsets[1:])
+        lits = [lit for clause in skeleton for lit in clause]
+        data = np.concatenate([np.array([size, len(skeleton)] + theory, dtype=np.int32), offsets, np.array(lits, dtype=np.int32)])
+
+        script = SmtLibScript()
+        variables = set()
+        for atom in atom_rev.values():
+            variables |= atom.get_free_variables()
+        for v in sorted(variables, key=str):
+            script.add("declare-fun", [v])
+        for i in range(1, size + 1):
+            script.add("assert", [atom_rev[i]])
+        text = io.StringIO()
+        script.serialize(text, daggify=False)
+
+        # write to temporary files first, so that a concurrent run never sees half an entry
+        # (the array is moved in place last, load checks for it)
+        tmp = f".{os.getpid()}.tmp"
+        with open(atoms_path + tmp, "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+        with open(array_path + tmp, "wb") as f:
+            np.save(f, data)
+        os.replace(atoms_path + tmp, atoms_path)
+        os.replace(array_path + tmp, array_path)
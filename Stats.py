@@ -0,0 +1,160 @@
+from typing import *
+
+import json
+import sys
+import time
+
+class Timer:
+    """
+    Accumulated time of one phase, used as a context manager (with stats.timer("sat"): ...)
+    """
+    def __init__(self, stats, name: str):
+        self.stats = stats
+        self.name = name
+        self.total = 0.0
+        self.calls = 0
+        self.since = 0.0
+
+    def __enter__(self):
+        self.stats.start(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.stop(self)
+
+
+class Stats:
+    """
+    Counters and phase timers of a run, cheap enough to be always on.
+    The solver counts into the attributes directly (stats.decisions += 1), the front end adds
+    the counters of its own (variables, clauses, ...) with update.
+    Timers are exclusive: a timer started while another one runs pauses the outer one, so
+    the theory checks inside the SAT search are not counted twice and the phase times add up.
+    With progress (seconds), a line of the counters is written to stderr every progress seconds,
+    the solver polls for it every POLL conflicts
+    """
+    # conflicts between two looks at the clock for the progress output
+    POLL = 256
+
+    def __init__(self, progress: float = 0, stream=None):
+        self.clock = time.monotonic
+        self.created = self.clock()
+        self.values = {}
+        self.timers = {}
+        self.running = []
+
+        self.decisions = 0
+        self.propagations = 0
+        self.conflicts = 0
+        self.restarts = 0
+        self.learned = 0
+        self.learned_literals = 0
+        # learned clauses by size: sizes[i] counts the ones of size 2^(i-1) + 1 .. 2^i
+        self.sizes = []
+        self.theory_checks = 0
+        self.theory_conflicts = 0
+        self.theory_propagations = 0
+        self.cache_hits = 0
+        self.blocking_clauses = 0
+        # theory cores, and their literals before and after minimization (see Cores.CoreMinimizer)
+        self.cores = 0
+        self.core_literals = 0
+        self.minimized_core_literals = 0
+
+        self.progress = progress
+        self.stream = sys.stderr if stream is None else stream
+        self.last_report = self.created
+        # the solver calls poll once conflicts reaches this
+        self.next_poll = Stats.POLL if progress > 0 else float("inf")
+
+    def __str__(self):
+        return f"Stats(decisions: {self.decisions}, conflicts: {self.conflicts}, theory checks: {self.theory_checks})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def update(self, **values):
+        self.values.update(values)
+
+    def timer(self, name: str) -> Timer:
+        t = self.timers.get(name)
+        if t is None:
+            t = self.timers[name] = Timer(self, name)
+        return t
+
+    def start(self, timer: Timer):
+        now = self.clock()
+        if self.running:
+            outer = self.running[-1]
+            outer.total += now - outer.since
+        self.running.append(timer)
+        timer.since = now
+        timer.calls += 1
+
+    def stop(self, timer: Timer):
+        now = self.clock()
+        timer.total += now - timer.since
+        self.running.pop()
+        if self.running:
+            self.running[-1].since = now
+
+    def learn(self, size: int):
+        """
+        Counts a learned clause of the given size
+        """
+        self.learned += 1
+        self.learned_literals += size
+        i = (size - 1).bit_length()
+        while len(self.sizes) <= i:
+            self.sizes.append(0)
+        self.sizes[i] += 1
+
+    def poll(self):
+        """
+        Writes a progress line if progress seconds passed since the last one
+        """
+        self.next_poll = self.conflicts + Stats.POLL
+        now = self.clock()
+        if now - self.last_report >= self.progress:
+            self.last_report = now
+            self.report()
+
+    def report(self):
+        line = {"elapsed": round(self.clock() - self.created, 3)}
+        line.update(self.counters())
+        print(json.dumps(line), file=self.stream, flush=True)
+
+    def counters(self) -> dict:
+        return {"decisions": self.decisions, "propagations": self.propagations, "conflicts": self.conflicts,
+                "restarts": self.restarts, "learned": self.learned, "theory_checks": self.theory_checks,
+                "theory_conflicts": self.theory_conflicts, "theory_propagations": self.theory_propagations,
+                "cache_hits": self.cache_hits, "blocking_clauses": self.blocking_clauses}
+
+    def to_dict(self) -> dict:
+        """
+        The values, the counters, the learned clause sizes and the seconds of every phase
+        (the time of running timers up to now)
+        """
+        now = self.clock()
+        times = {name: t.total for name, t in self.timers.items()}
+        if self.running:
+            # the outer timers are paused, only the innermost one is really running
+            t = self.running[-1]
+            times[t.name] += now - t.since
+        d = dict(self.values)
+        d.update(self.counters())
+        d["learned_literals"] = self.learned_literals
+        d["cores"] = self.cores
+        d["core_literals"] = self.core_literals
+        d["minimized_core_literals"] = self.minimized_core_literals
+        d["learned_sizes"] = {(f"<={1 << i}"): n for i, n in enumerate(self.sizes) if n}
+        d["time"] = {name: round(seconds, 6) for name, seconds in times.items()}
+        d["total_time"] = round(now - self.created, 6)
+        return d
+
+    def write(self, fpath: str):
+        """
+        Writes the statistics to a JSON file (benchmark.py reads them)
+        """
+        with open(fpath, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
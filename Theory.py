@@ -0,0 +1,478 @@
+from typing import *
+
+from fractions import Fraction
+
+from pysmt.shortcuts import Solver, Not, Iff, FreshSymbol
+
+from TheoryCache import TheoryCache
+from Stats import Stats
+from Linear import linear_atom, NEGATED
+from Simplex import Simplex
+from Cores import CoreMinimizer
+
+# how Z3Theory gets the unsat cores out of z3
+CORE_EXTRACTIONS = ("assumptions", "named")
+
+def is_theory_atom(atom, shared: Container = ()) -> bool:
+    """
+    Returns true if the atom is an arithmetic atom (eg. x + y <= 0), or one of the shared Boolean variables
+    """
+    return not atom.is_symbol() or atom in shared
+
+def shared_symbols(atoms: Iterable) -> set:
+    """
+    The Boolean variables that occur inside the arithmetic atoms (in the conditions of if-then-else terms,
+    eg. b in (ite b x y) <= 3). The theory has to check them with the atoms, or it picks their values itself
+    """
+    shared = set()
+    for atom in atoms:
+        if not atom.is_symbol():
+            shared.update(v for v in atom.get_free_variables() if v.symbol_type().is_bool_type())
+    return shared
+
+
+class Theory:
+    """
+    Interface between the CDCL search and a theory solver (online DPLL(T)).
+    The SAT solver tells the theory about every literal it puts on the trail (assert_lit),
+    opens a theory level for every decision level (push) and closes them again when it backjumps (pop).
+    After propagation it asks for a consistency check; final is true if the Boolean model is complete.
+    A theory conflict comes back as the literals of a conflict clause, which are all false in the model.
+    After a consistent check, propagate returns literals the asserted ones imply, and explain gives
+    the clause of such a literal (the literal, then the negations of the asserted literals that imply it).
+    This base class is the empty theory, every Boolean model is consistent with it
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def push(self):
+        pass
+
+    def pop(self, levels: int):
+        pass
+
+    def assert_lit(self, lit: int):
+        pass
+
+    def check(self, final: bool) -> Optional[list[int]]:
+        return None
+
+    def propagate(self) -> list[int]:
+        return []
+
+    def explain(self, lit: int) -> list[int]:
+        raise NotImplementedError(f"{type(self).__name__} does not imply literals")
+
+
+class Z3Theory(Theory):
+    """
+    QF_LRA theory solver that keeps one incremental z3 instance in sync with the trail.
+    Only the arithmetic atoms (and the Boolean variables inside them) go to z3, the other Boolean atoms of the
+    skeleton are left to the SAT solver.
+    With partial set, the assignment is checked after every propagation, otherwise only complete models are checked.
+    The conflict clause of an inconsistent assignment is the negated unsat core, cores selects how the core is
+    extracted (one of CORE_EXTRACTIONS): named asserts every literal as a named assertion on its level (z3 push/pop)
+    and asks for the named core; assumptions defines a tracking literal b <-> atom for every atom once, and checks
+    the assignment under the tracking literals as assumptions, the core is the assumptions z3 used (no assertions,
+    push or pop per check).
+    With a minimizer (a Cores.CoreMinimizer) the cores are minimized by checks of their subsets under assumptions.
+    With a cache, checks of assignments the cache can answer do not go to z3.
+    stats (a Stats) counts the z3 checks, the conflicts and the cache hits
+    """
+    def __init__(self, atom_map: dict, atom_rev: dict, partial: bool = True, cache: Optional[TheoryCache] = None,
+                 stats: Optional[Stats] = None, cores: str = "assumptions", minimizer: Optional[CoreMinimizer] = None):
+        if cores not in CORE_EXTRACTIONS:
+            raise ValueError(f"unknown core extraction: {cores}, expected one of {list(CORE_EXTRACTIONS)}")
+        self.named = cores == "named"
+        self.solver = Solver(name="z3", logic="QF_LRA", unsat_cores_mode="all" if self.named else None)
+        self.atom_map = atom_map
+        self.atom_rev = atom_rev
+        self.partial = partial
+        self.cache = cache
+        self.minimizer = minimizer
+        self.stats = Stats() if stats is None else stats
+        # the asserted theory literals, and where each level starts in them
+        self.asserted = []
+        self.asserted_lim = []
+        self.theory_atom = bytearray(len(atom_rev) + 1)
+        shared = shared_symbols(atom_rev.values())
+        for i, atom in atom_rev.items():
+            self.theory_atom[i] = is_theory_atom(atom, shared)
+        # the tracking literal of every theory atom, and the atom of every tracking literal
+        self.trackers = {}
+        self.tracked = {}
+        # the solver that checks under assumptions (the solver itself, unless cores are named)
+        self.checker = None
+        if not self.named:
+            self.checker = self.track(self.solver)
+        # true if there are assertions that z3 has not checked yet
+        self.dirty = False
+        # true if the last command was a satisfiable check, ie. z3 has a model of the assertions
+        self.solved = False
+        self.checks = 0
+        self.conflicts = 0
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.solver.exit()
+        if self.checker is not None and self.checker is not self.solver:
+            self.checker.exit()
+
+    def __str__(self):
+        return f"Z3Theory(checks: {self.checks}, conflicts: {self.conflicts})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def track(self, solver):
+        """
+        Defines the tracking literals of the theory atoms in a solver
+        """
+        for i, atom in self.atom_rev.items():
+            if self.theory_atom[i]:
+                if i not in self.trackers:
+                    b = self.trackers[i] = FreshSymbol()
+                    self.tracked[b] = i
+                solver.add_assertion(Iff(self.trackers[i], atom))
+        return solver
+
+    def assumptions(self, literals: Iterable[int]) -> list:
+        trackers = self.trackers
+        return [trackers[lit] if lit > 0 else Not(trackers[-1 * lit]) for lit in literals]
+
+    def failed(self, solver) -> list[int]:
+        """
+        The theory literals of the assumptions in the core of the last (unsat) check under assumptions
+        """
+        core = []
+        for t in solver.z3.unsat_core():
+            b = solver.converter.back(t)
+            core.append(-1 * self.tracked[b.arg(0)] if b.is_not() else self.tracked[b])
+        return core
+
+    def push(self):
+        if self.named:
+            self.solver.push()
+        self.asserted_lim.append(len(self.asserted))
+        self.solved = False
+
+    def pop(self, levels: int):
+        # a subset of a consistent set of assertions is consistent, so dirty stays as it is
+        if self.named:
+            self.solver.pop(levels)
+        del self.asserted[self.asserted_lim[-levels]:]
+        del self.asserted_lim[-levels:]
+        self.solved = False
+
+    def assert_lit(self, lit: int):
+        if self.theory_atom[abs(lit)]:
+            if self.named:
+                atom = self.atom_rev[abs(lit)]
+                self.solver.add_assertion(atom if lit > 0 else Not(atom))
+            self.asserted.append(lit)
+            self.dirty = True
+            self.solved = False
+
+    def check(self, final: bool) -> Optional[list[int]]:
+        if not self.dirty or not (final or self.partial):
+            return None
+
+        key = None
+        if self.cache is not None:
+            key = TheoryCache.key(self.asserted)
+            hit = self.cache.lookup(key, final)
+            if hit is not None:
+                consistent, core = hit
+                self.stats.cache_hits += 1
+                if consistent:
+                    self.dirty = False
+                    return None
+                self.conflicts += 1
+                self.stats.theory_conflicts += 1
+                return [-1 * lit for lit in core]
+
+        self.checks += 1
+        self.stats.theory_checks += 1
+        if self.solver.solve() if self.named else self.solver.solve(self.assumptions(self.asserted)):
+            self.dirty = False
+            self.solved = True
+            if key is not None:
+                self.cache.store(key, True)
+            return None
+
+        self.conflicts += 1
+        self.stats.theory_conflicts += 1
+        if self.named:
+            core = [self.literal(formula) for formula in self.solver.get_unsat_core()]
+        else:
+            core = self.failed(self.solver)
+        if self.minimizer is not None:
+            core = self.minimizer.minimize(core, self.check_subset)
+        if key is not None:
+            self.cache.store(key, False, core)
+        return [-1 * lit for lit in core]
+
+    def check_subset(self, literals: list[int]) -> Optional[list[int]]:
+        """
+        Checks theory literals on their own, under assumptions. Returns None if they are consistent, otherwise a core
+        """
+        if self.checker is None:
+            self.checker = self.track(Solver(name="z3", logic="QF_LRA"))
+        self.solved = False
+        if self.checker.solve(self.assumptions(literals)):
+            return None
+        return self.failed(self.checker)
+
+    def literal(self, formula) -> int:
+        """
+        The literal of an atom or a negated atom
+        """
+        if formula.is_not():
+            return -1 * self.atom_map[formula.arg(0)]
+        return self.atom_map[formula]
+
+    def get_model(self):
+        """
+        The z3 model of the current assertions, which have to be consistent
+        """
+        if not self.solved:
+            self.solved = self.solver.solve() if self.named else self.solver.solve(self.assumptions(self.asserted))
+            assert self.solved
+        return self.solver.get_model()
+
+
+class SimplexTheory(Theory):
+    """
+    QF_LRA theory solver on the built-in general simplex (see Simplex), without z3.
+    Every arithmetic atom is brought into the normal form of a LinearAtom once, and the rows of all the
+    terms are in the tableau from the start; a literal asserts its bound, a level of the trail is a level of
+    the bound trail. The conflict clause of an inconsistent assignment is the negated explanation of the simplex.
+    With partial set, the bounds are checked after every propagation, otherwise only complete models are checked
+    (disequalities are only split in the checks of complete models).
+    Unless exact, the simplex runs on floats, and its answers are verified with exact arithmetic: a conflict by
+    checking its literals on their own, a model of a complete assignment by evaluating every asserted atom.
+    An exact simplex that asserts the same bounds answers the checks that fail the verification.
+    The atoms that are not assigned yet are implied by the bounds on their terms (x - y <= 3 implies x - y <= 5,
+    and that x - y > 7 is false), for the terms whose bounds changed since the last propagation;
+    the bounds that implied a literal are its explanation.
+    With a minimizer (a Cores.CoreMinimizer) the explanations of conflicts that split a disequality are minimized
+    by checks of their subsets.
+    Raises ValueError if an atom is not linear (eg. it has an if-then-else term), z3 has to check those
+    """
+    def __init__(self, atom_rev: dict, partial: bool = True, cache: Optional[TheoryCache] = None,
+                 stats: Optional[Stats] = None, exact: bool = True, minimizer: Optional[CoreMinimizer] = None):
+        self.partial = partial
+        self.cache = cache
+        self.minimizer = minimizer
+        self.stats = Stats() if stats is None else stats
+        # the LinearAtom of every theory atom, None for the Boolean variables
+        self.linear = [None] * (len(atom_rev) + 1)
+        for i, atom in atom_rev.items():
+            if is_theory_atom(atom):
+                self.linear[i] = linear_atom(atom)
+                if self.linear[i] is None:
+                    raise ValueError(f"not a linear atom: {atom}")
+        self.simplex = Simplex(exact)
+        self.exact = None if exact else Simplex()
+        # the exact simplex that checks sets of literals on their own (see check_subset)
+        self.checker = Simplex()
+        # the simplex variable of the term of every atom (all the simplexes number the terms the same way),
+        # and the atoms over the term of every variable
+        self.var = [0] * len(self.linear)
+        self.atoms_of = {}
+        for i, atom in enumerate(self.linear):
+            if atom is not None:
+                x = self.var[i] = self.simplex.term(atom.term)
+                self.checker.term(atom.term)
+                if self.exact is not None:
+                    self.exact.term(atom.term)
+                self.atoms_of.setdefault(x, []).append(i)
+        self.assigned = bytearray(len(self.linear))
+        # the variables whose bounds were asserted since the last propagation
+        self.touched = []
+        # implied literal -> the literals of the bounds that imply it
+        self.antecedents = {}
+        self.asserted = []
+        self.asserted_lim = []
+        self.dirty = False
+        self.checks = 0
+        self.conflicts = 0
+        # float checks whose answer did not pass the verification, and whether the last check was one
+        self.fallbacks = 0
+        self.fallback = False
+        # true if the last consistent answer came from the simplex (and not from the cache), ie. its assignment is
+        # within the asserted bounds and off the disequalities; a pop keeps it there (the bounds only get looser)
+        self.solved = False
+
+    def __str__(self):
+        return f"SimplexTheory(checks: {self.checks}, conflicts: {self.conflicts}, pivots: {self.simplex.pivots}, fallbacks: {self.fallbacks})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def push(self):
+        self.simplex.push()
+        if self.exact is not None:
+            self.exact.push()
+        self.asserted_lim.append(len(self.asserted))
+
+    def pop(self, levels: int):
+        self.simplex.pop(levels)
+        if self.exact is not None:
+            self.exact.pop(levels)
+        start = self.asserted_lim[-levels]
+        for lit in self.asserted[start:]:
+            self.assigned[abs(lit)] = 0
+        del self.asserted[start:]
+        del self.asserted_lim[-levels:]
+        self.touched.clear()
+
+    def assert_lit(self, lit: int):
+        atom = self.linear[abs(lit)]
+        if atom is not None:
+            op = atom.op if lit > 0 else NEGATED[atom.op]
+            x = self.var[abs(lit)]
+            self.simplex.assert_relation(x, op, atom.bound, lit)
+            if self.exact is not None:
+                self.exact.assert_relation(x, op, atom.bound, lit)
+            self.asserted.append(lit)
+            self.assigned[abs(lit)] = 1
+            self.touched.append(x)
+            self.dirty = True
+            self.solved = False
+
+    def check(self, final: bool) -> Optional[list[int]]:
+        simplex = self.simplex
+        if simplex.conflict is None and (not self.dirty or not (final or self.partial)):
+            return None
+
+        key = None
+        if self.cache is not None:
+            key = TheoryCache.key(self.asserted)
+            hit = self.cache.lookup(key, final)
+            if hit is not None:
+                consistent, core = hit
+                self.stats.cache_hits += 1
+                if consistent:
+                    self.dirty = False
+                    return None
+                self.conflicts += 1
+                self.stats.theory_conflicts += 1
+                return [-1 * lit for lit in core]
+
+        self.checks += 1
+        self.stats.theory_checks += 1
+        core = simplex.check(final)
+        self.fallback = self.exact is not None and (not self.refutes(core) if core is not None else final and not self.verify())
+        if self.fallback:
+            self.fallbacks += 1
+            core = self.exact.check(final)
+
+        # disequalities are only split in final checks, a partial check does not decide them
+        complete = final or not simplex.disequal
+        if core is None:
+            if complete:
+                self.dirty = False
+                self.solved = final
+                if key is not None:
+                    self.cache.store(key, True)
+            return None
+
+        self.conflicts += 1
+        self.stats.theory_conflicts += 1
+        if self.minimizer is not None:
+            # the explanation of one row or of two bounds is minimal in practice, the union of the cores
+            # of the two sides of a disequality often is not
+            split = final and simplex.disequal
+            core = self.minimizer.minimize(core, self.check_subset if split else None)
+        if key is not None:
+            self.cache.store(key, False, core)
+        return [-1 * lit for lit in core]
+
+    def propagate(self) -> list[int]:
+        # the bounds of the exact simplex, the float one could imply literals that only hold up to eps
+        simplex = self.simplex if self.exact is None else self.exact
+        if simplex.conflict is not None:
+            return []
+        implied = []
+        linear, assigned, antecedents = self.linear, self.assigned, self.antecedents
+        for x in dict.fromkeys(self.touched):
+            for i in self.atoms_of[x]:
+                if assigned[i]:
+                    continue
+                atom = linear[i]
+                for lit, op in ((i, atom.op), (-1 * i, NEGATED[atom.op])):
+                    reason = simplex.entailed(x, op, atom.bound)
+                    if reason is not None:
+                        implied.append(lit)
+                        antecedents[lit] = reason
+                        break
+        self.touched.clear()
+        return implied
+
+    def explain(self, lit: int) -> list[int]:
+        return [lit] + [-1 * q for q in self.antecedents[lit]]
+
+    def check_subset(self, literals: list[int]) -> Optional[list[int]]:
+        """
+        Checks theory literals on their own (in exact arithmetic). Returns None if they are consistent, otherwise a core
+        """
+        checker = self.checker
+        checker.push()
+        for lit in literals:
+            atom = self.linear[abs(lit)]
+            checker.assert_relation(self.var[abs(lit)], atom.op if lit > 0 else NEGATED[atom.op], atom.bound, lit)
+        core = checker.check(True)
+        checker.pop(1)
+        return core
+
+    def refutes(self, core: list[int]) -> bool:
+        """
+        Returns true if the literals of a core are inconsistent by themselves
+        """
+        return self.check_subset(core) is not None
+
+    def verify(self) -> bool:
+        """
+        Returns true if the model of the float simplex satisfies every asserted atom (in exact arithmetic)
+        """
+        values = {name: Fraction(v) for name, v in self.simplex.model().items()}
+        for lit in self.asserted:
+            atom = self.linear[abs(lit)]
+            if not atom.holds(values, atom.op if lit > 0 else NEGATED[atom.op]):
+                return False
+        return True
+
+    def get_model(self) -> dict:
+        """
+        The values of the real variables in the current assignment, which has to be consistent
+        """
+        if not self.solved:
+            # the last check was answered by the cache, the simplex has not moved its assignment into the bounds
+            simplex = self.simplex if self.exact is None else self.exact
+            core = simplex.check(True)
+            assert core is None
+            self.solved = True
+            self.fallback = self.exact is not None
+        if self.fallback:
+            return self.exact.model()
+        return self.simplex.model()
+
+
+THEORIES = ("simplex", "z3")
+
+def make_theory(name: str, atom_map: dict, atom_rev: dict, exact: bool = True, cores: str = "assumptions", **options) -> Theory:
+    """
+    Returns a new theory solver by its name (one of THEORIES), options go to its constructor
+    (exact only to the simplex, cores only to z3). The simplex falls back to z3 if an atom is not linear
+    """
+    if name not in THEORIES:
+        raise ValueError(f"unknown theory solver: {name}, expected one of {list(THEORIES)}")
+    if name == "simplex":
+        try:
+            return SimplexTheory(atom_rev, exact=exact, **options)
+        except ValueError:
+            pass
+    return Z3Theory(atom_map, atom_rev, cores=cores, **options)
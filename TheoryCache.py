@@ -0,0 +1,111 @@
+from typing import *
+
+from collections import OrderedDict
+
+class TheoryCache:
+    """
+    LRU cache of theory checks, keyed on the theory literals of an assignment in sorted order
+    (the Boolean model projected on the arithmetic atoms, see key).
+    An entry holds whether the assignment is consistent, and the literals of an unsat core if it is not.
+    Besides exact hits, an assignment is known to be inconsistent if it contains the core of a cached
+    inconsistent assignment, and (in final checks) consistent if it is a subset of a cached consistent assignment.
+    Neither search scans the entries: the cores are indexed by one of their literals (the one watching the fewest
+    cores when it is stored), so only the cores watched by a literal of the assignment are tested, and the consistent assignments by all of their
+    literals, so only the ones that contain the rarest literal of the assignment are tested.
+    A size of 0 disables the cache
+    """
+    def __init__(self, size: int = 1024):
+        self.size = size
+        # key -> (consistent, core, set of the key literals (consistent) or of the core literals)
+        self.entries = OrderedDict()
+        # literal -> keys of the inconsistent entries whose core it watches (0 for an empty core),
+        # and the literal that watches the core of every inconsistent entry
+        self.cores = {}
+        self.watch = {}
+        # literal -> keys of the consistent entries that contain it
+        self.consistent = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        return f"TheoryCache(entries: {len(self.entries)}, hits: {self.hits}, misses: {self.misses})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    @staticmethod
+    def key(literals: Iterable[int]) -> tuple[int, ...]:
+        return tuple(sorted(literals))
+
+    def lookup(self, key: tuple[int, ...], final: bool = True) -> Optional[tuple[bool, tuple[int, ...]]]:
+        """
+        Returns (consistent, core) for the assignment, or None if the cache can not tell.
+        Subsets of consistent assignments are only looked for if final is true
+        """
+        entries = self.entries
+        entry = entries.get(key)
+        if entry is not None:
+            return self.hit(key)
+
+        literals = set(key)
+        cores = self.cores
+        # the watching literals that are in the assignment, from whichever of the two is smaller
+        if len(cores) <= len(key):
+            watching = [lit for lit in cores if lit == 0 or lit in literals]
+        else:
+            watching = [lit for lit in (0,) + key if lit in cores]
+        for lit in watching:
+            for k in cores[lit]:
+                if entries[k][2].issubset(literals):
+                    return self.hit(k)
+
+        if final and self.consistent:
+            if not key:
+                # the empty assignment is a subset of any of them
+                return self.hit(next(iter(next(iter(self.consistent.values())))))
+            rarest = min(key, key=lambda lit: len(self.consistent.get(lit, ())))
+            for k in self.consistent.get(rarest, ()):
+                if literals.issubset(entries[k][2]):
+                    return self.hit(k)
+
+        self.misses += 1
+        return None
+
+    def hit(self, key: tuple[int, ...]) -> tuple[bool, tuple[int, ...]]:
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return self.entries[key][:2]
+
+    def store(self, key: tuple[int, ...], consistent: bool, core: Iterable[int] = ()):
+        if self.size <= 0:
+            return
+        if key in self.entries:
+            self.remove(key)
+        core = tuple(sorted(core))
+        self.entries[key] = (consistent, core, frozenset(key if consistent else core))
+        if consistent:
+            for lit in key:
+                self.consistent.setdefault(lit, {})[key] = None
+        else:
+            lit = self.watch[key] = min(core, key=lambda lit: len(self.cores.get(lit, ())), default=0)
+            self.cores.setdefault(lit, {})[key] = None
+        if len(self.entries) > self.size:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, key: tuple[int, ...]):
+        consistent, core, lits = self.entries.pop(key)
+        if consistent:
+            for lit in key:
+                index = self.consistent[lit]
+                del index[key]
+                if not index:
+                    del self.consistent[lit]
+        else:
+            lit = self.watch.pop(key)
+            index = self.cores[lit]
+            del index[key]
+            if not index:
+                del self.cores[lit]
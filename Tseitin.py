@@ -0,0 +1,136 @@
+from typing import *
+
+from contextlib import nullcontext
+
+from pysmt.shortcuts import FreshSymbol, Not
+from pysmt.smtlib.parser import SmtLibParser
+
+from Stats import Stats
+
+class Tseitin:
+    """
+    Tseitin encoder from pysmt formulas straight into integer clauses, without building a CNF formula first.
+    Every node of the formula DAG is encoded once: memo maps a node to its literal, so shared subterms
+    share their gate variable. Atoms (Boolean variables and theory atoms such as x + y <= 0) get their ids
+    the first time they are seen, and every gate gets a fresh Boolean symbol, so that atom_map/atom_rev
+    cover every variable of the clauses (like main.build_skeleton_map).
+    Negations are not gates, they are negated literals. Top level conjunctions and disjunctions
+    are asserted as clauses directly
+    """
+    def __init__(self):
+        self.atom_map = {}
+        self.atom_rev = {}
+        self.clauses = []
+        self.memo = {}
+        # the literal that is true, added on the first constant seen
+        self.true = 0
+
+    def __len__(self):
+        return len(self.atom_rev)
+
+    def __str__(self):
+        return f"Tseitin(vars: {len(self.atom_rev)}, clauses: {len(self.clauses)}, nodes: {len(self.memo)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def new_var(self, node) -> int:
+        v = len(self.atom_rev) + 1
+        self.atom_map[node] = v
+        self.atom_rev[v] = node
+        return v
+
+    def assert_formula(self, formula):
+        """
+        Adds clauses that are satisfiable iff the formula is
+        """
+        stack = [formula]
+        while stack:
+            node = stack.pop()
+            if node.is_and():
+                stack.extend(node.args())
+            elif node.is_or():
+                self.clauses.append([self.literal(arg) for arg in node.args()])
+            elif node.is_implies():
+                self.clauses.append([-1 * self.literal(node.arg(0)), self.literal(node.arg(1))])
+            elif node.is_not() and node.arg(0).is_not():
+                stack.append(node.arg(0).arg(0))
+            elif node.is_not() and node.arg(0).is_or():
+                stack.extend(Not(arg) for arg in node.arg(0).args())
+            elif not node.is_true():
+                self.clauses.append([self.literal(node)])
+
+    def literal(self, formula) -> int:
+        """
+        Returns the literal of a formula, encoding the gates of the nodes below it that are not encoded yet
+        (in post order with an explicit stack, formulas can be deep)
+        """
+        memo = self.memo
+        stack = [formula]
+        while stack:
+            node = stack[-1]
+            if node in memo:
+                stack.pop()
+                continue
+
+            if node.is_bool_constant():
+                if self.true == 0:
+                    self.true = self.new_var(FreshSymbol())
+                    self.clauses.append([self.true])
+                memo[node] = self.true if node.is_true() else -1 * self.true
+            elif node.is_and() or node.is_or() or node.is_not() or node.is_implies() or node.is_iff() \
+                    or (node.is_ite() and node.arg(1).get_type().is_bool_type()):
+                pending = [arg for arg in node.args() if arg not in memo]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                memo[node] = self.gate(node)
+            else:
+                memo[node] = self.new_var(node)
+            stack.pop()
+
+        return memo[formula]
+
+    def gate(self, node) -> int:
+        """
+        Encodes a connective whose arguments are encoded already, returns its literal
+        """
+        args = [self.memo[arg] for arg in node.args()]
+        if node.is_not():
+            return -1 * args[0]
+
+        g = self.new_var(FreshSymbol())
+        clauses = self.clauses
+        if node.is_and():
+            for a in args:
+                clauses.append([-1 * g, a])
+            clauses.append([g] + [-1 * a for a in args])
+        elif node.is_or() or node.is_implies():
+            if node.is_implies():
+                args[0] = -1 * args[0]
+            for a in args:
+                clauses.append([g, -1 * a])
+            clauses.append([-1 * g] + args)
+        elif node.is_iff():
+            a, b = args
+            clauses.extend([[-1 * g, -1 * a, b], [-1 * g, a, -1 * b], [g, a, b], [g, -1 * a, -1 * b]])
+        else:
+            c, t, e = args
+            clauses.extend([[-1 * g, -1 * c, t], [-1 * g, c, e], [g, -1 * c, -1 * t], [g, c, -1 * e]])
+        return g
+
+
+def read_skeleton(fname: str, stats: Optional[Stats] = None) -> (list[list[int]], dict, dict):
+    """
+    Parses an SMT-LIB 2 script and Tseitin encodes its assertions one by one as they are parsed.
+    With stats, the encoding is timed as the cnf phase (the parsing around it is not).
+    Returns the clauses, the atom map and its inverse
+    """
+    tseitin = Tseitin()
+    cnf = stats.timer("cnf") if stats is not None else nullcontext()
+    with open(fname, "r") as f:
+        for cmd in SmtLibParser().get_command_generator(f):
+            if cmd.name == "assert":
+                with cnf:
+                    tseitin.assert_formula(cmd.args[0])
+    return (tseitin.clauses, tseitin.atom_map, tseitin.atom_rev)
@@ -0,0 +1,113 @@
+from typing import *
+
+import random
+
+class VarHeap:
+    """
+    Indexed binary max-heap of variables ordered by their VSIDS activity.
+    heap holds the variables, indices[var] is the position of var in heap (-1 if it is not in the heap).
+    Activities are bumped by an increment that grows by 1/decay after every conflict (EVSIDS),
+    which decays all the other activities without touching them.
+    With a seed the variables start with small random activities (below any bump) instead of
+    all at 0, which only changes the order of the first decisions.
+    """
+    def __init__(self, literals: int, decay: float = 0.95, seed: Optional[int] = None):
+        self.size = literals
+        self.activity = [0.0] * (literals + 1)
+        self.increment = 1.0
+        self.decay_factor = decay
+        self.heap = list(range(1, literals + 1))
+        if seed is not None:
+            rng = random.Random(seed)
+            self.activity = [0.0] + [rng.random() * 1e-3 for _ in range(literals)]
+            # sorted by descending activity is a valid max-heap
+            self.heap.sort(key=lambda v: -self.activity[v])
+        self.indices = [-1] * (literals + 1)
+        for i, v in enumerate(self.heap):
+            self.indices[v] = i
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __str__(self):
+        return str([(v, self.activity[v]) for v in self.heap])
+
+    def __repr__(self):
+        return self.__str__()
+
+    def contains(self, var: int) -> bool:
+        return self.indices[var] >= 0
+
+    def percolate_up(self, i: int):
+        heap, indices, activity = self.heap, self.indices, self.activity
+        var = heap[i]
+        act = activity[var]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if activity[heap[parent]] >= act:
+                break
+            heap[i] = heap[parent]
+            indices[heap[i]] = i
+            i = parent
+        heap[i] = var
+        indices[var] = i
+
+    def percolate_down(self, i: int):
+        heap, indices, activity = self.heap, self.indices, self.activity
+        var = heap[i]
+        act = activity[var]
+        n = len(heap)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and activity[heap[child + 1]] > activity[heap[child]]:
+                child += 1
+            if activity[heap[child]] <= act:
+                break
+            heap[i] = heap[child]
+            indices[heap[i]] = i
+            i = child
+        heap[i] = var
+        indices[var] = i
+
+    def insert(self, var: int):
+        """
+        Inserts a variable (eg. when it is unassigned by a backjump), does nothing if it is already in the heap
+        """
+        if self.indices[var] >= 0:
+            return
+        self.indices[var] = len(self.heap)
+        self.heap.append(var)
+        self.percolate_up(len(self.heap) - 1)
+
+    def pop(self) -> int:
+        """
+        Removes and returns the variable with the highest activity
+        """
+        heap = self.heap
+        top = heap[0]
+        last = heap.pop()
+        self.indices[top] = -1
+        if heap:
+            heap[0] = last
+            self.indices[last] = 0
+            self.percolate_down(0)
+        return top
+
+    def bump(self, var: int):
+        """
+        Increases the activity of a variable, rescaling every activity if they get too large
+        """
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+        if self.indices[var] >= 0:
+            self.percolate_up(self.indices[var])
+
+    def decay(self):
+        """
+        Decays all activities by growing the bump increment instead
+        """
+        self.increment /= self.decay_factor
@@ -0,0 +1,148 @@
+from typing import *
+
+from ClauseArena import ClauseArena
+from Model import Model
+
+class Watches:
+    """
+    Two-watched-literal index over the clauses of a ClauseArena.
+    Every clause with two or more literals watches the first two literals it has in the arena,
+    and watches[lit] holds the indices of the clauses that currently watch lit (indexed like the model,
+    so -lit wraps around to the back of the list). When a literal becomes false only the clauses
+    watching it are visited, the rest of the clause set is never looked at.
+    """
+    def __init__(self, literals: int, arena: ClauseArena):
+        self.size = literals
+        self.arena = arena
+        self.watches = [[] for _ in range(2 * literals + 1)]
+
+    def __str__(self):
+        return str({lit: len(self.watches[lit]) for lit in range(-1 * self.size, self.size + 1) if lit != 0 and self.watches[lit]})
+
+    def __repr__(self):
+        return self.__str__()
+
+    def watch(self, c: int):
+        """
+        Starts watching the first two literals of the clause.
+        The caller is responsible for ordering the literals such that the watched literals
+        are not false, or are the false literals assigned last
+        """
+        lits = self.arena.mv_lits
+        s = self.arena.mv_start[c]
+        self.watches[lits[s]].append(c)
+        self.watches[lits[s + 1]].append(c)
+
+    def detach(self, deleted: set[int]):
+        """
+        Drops the clauses in deleted from every watch list in one pass
+        """
+        for i in range(len(self.watches)):
+            watchers = self.watches[i]
+            if watchers:
+                self.watches[i] = [c for c in watchers if c not in deleted]
+
+    def remap(self, remap):
+        """
+        Renumbers the watched clauses after the arena was compacted (remap[old] is the new index or -1)
+        """
+        remap = remap.tolist()
+        for i in range(len(self.watches)):
+            watchers = self.watches[i]
+            if watchers:
+                self.watches[i] = [remap[c] for c in watchers if remap[c] >= 0]
+
+    def add_clause(self, c: int, model: Model) -> bool:
+        """
+        Adds an input clause before search starts (ie. at level 0).
+        Unit clauses are not watched, their literal is added to the model instead.
+        Returns False if the clause is falsified by the model (the clause set is unsat)
+        """
+        size = self.arena.mv_size[c]
+        if size == 0:
+            return False
+
+        if size == 1:
+            lit = self.arena.mv_lits[self.arena.mv_start[c]]
+            if model.has(-1 * lit):
+                return False
+            if not model.has(lit):
+                model.add(lit, c)
+            return True
+
+        self.watch(c)
+        return True
+
+    def propagate(self, model: Model) -> Optional[int]:
+        """
+        Unit propagates every literal on the trail of the model that has not been propagated yet.
+        For each such literal only the clauses watching its negation are visited: either a new
+        non-false literal is found to watch, or the clause is unit and the other watch is implied,
+        or the clause is falsified.
+        Returns the index of the conflicting clause, or None if propagation finished without a conflict
+        """
+        trail = model.trail
+        data = model.data
+        watches = self.watches
+        lits = self.arena.mv_lits
+        start = self.arena.mv_start
+        sizes = self.arena.mv_size
+
+        while model.qhead < len(trail):
+            false_lit = -1 * trail[model.qhead]
+            model.qhead += 1
+
+            watchers = watches[false_lit]
+            n = len(watchers)
+            i = j = 0
+            while i < n:
+                c = watchers[i]
+                i += 1
+                s = start[c]
+
+                # make sure the false literal is the second watch
+                first = lits[s]
+                if first == false_lit:
+                    first = lits[s + 1]
+                    lits[s] = first
+                    lits[s + 1] = false_lit
+
+                # clause already satisfied by the other watch
+                if data[first]:
+                    watchers[j] = c
+                    j += 1
+                    continue
+
+                # look for a new literal to watch
+                k = s + 2
+                end = s + sizes[c]
+                while k < end:
+                    lit = lits[k]
+                    if not data[-1 * lit]:
+                        lits[s + 1] = lit
+                        lits[k] = false_lit
+                        watches[lit].append(c)
+                        break
+                    k += 1
+
+                if k < end:
+                    continue
+
+                # no replacement, the clause is unit or conflicting
+                watchers[j] = c
+                j += 1
+
+                if data[-1 * first]:
+                    while i < n:
+                        watchers[j] = watchers[i]
+                        i += 1
+                        j += 1
+                    del watchers[j:]
+                    model.qhead = len(trail)
+                    return c
+
+                model.add(first, c)
+
+            del watchers[j:]
+
+        return None
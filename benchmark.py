@@ -0,0 +1,273 @@
+"""
+Benchmark runner over the test instances
+
+Runs every instance of the suites as a separate process (main.py for SMT-LIB files, parse-dimacs.py for
+DIMACS files, or z3 on both) with a CPU time and memory limit, a pool of jobs at a time.
+Checks the answer against the directory the instance is in (sat/unsat), and writes the wall time,
+CPU time, peak RSS and the solver counters (see --stats of main.py) of every instance to a JSON file.
+Runs can be compared against baselines: JSON files of earlier runs (of our solver or z3), or the
+results text files of the old test-runner shell scripts (sat-results-z3.txt, ...).
+
+How to run -
+python benchmark.py [sat unsat project1] [--solver {ours,z3}] [--jobs N] [--cpu-limit SECONDS] [--memory-limit MB]
+                    [--args "SOLVER ARGS"] [--output FILE.json] [--baseline FILE ...] [--max-slowdown FACTOR]
+
+The exit code is 1 if an answer is wrong, or if an instance regressed against a JSON baseline of our solver
+(it is not solved anymore, or it is slower by more than --max-slowdown), so that it can gate merges.
+The text files only have the time the solver reported (without starting python and parsing),
+so they are shown for reference but are not compared for regressions.
+"""
+
+from typing import *
+
+import argparse
+import json
+import os
+import resource
+import shlex
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# suite name -> directories of instances, the expected answer is the name of the directory
+SUITES = {
+    "sat": ["tests/sat"],
+    "unsat": ["tests/unsat"],
+    "project1": ["tests/project1-tests/sat", "tests/project1-tests/unsat"],
+}
+
+# runs that took less than this are too short to tell a regression from noise
+MIN_TIME = 0.5
+
+
+def instances(suites: Iterable[str]) -> list[tuple[str, str]]:
+    """
+    The (path relative to the repository, expected answer) of every instance of the suites
+    """
+    found = []
+    for suite in suites:
+        for directory in SUITES[suite]:
+            for path in sorted(glob(os.path.join(ROOT, directory, "*"))):
+                found.append((os.path.relpath(path, ROOT), os.path.basename(directory)))
+    return found
+
+
+def command(solver: str, path: str, args: list[str], stats: str) -> list[str]:
+    path = os.path.join(ROOT, path)
+    if solver == "z3":
+        return ["z3"] + args + (["-dimacs"] if path.endswith(".cnf") else []) + [path]
+    script = "parse-dimacs.py" if path.endswith(".cnf") else "main.py"
+    return [sys.executable, os.path.join(ROOT, script)] + args + ["--stats", stats, path]
+
+
+def answer(output: str) -> str:
+    """
+    sat, unsat or unknown from the output of main.py, parse-dimacs.py (a model or None) or z3
+    """
+    first = output.split("\n", 1)[0].strip()
+    if first in ("sat", "s SATISFIABLE") or first.startswith("["):
+        return "sat"
+    if first in ("unsat", "s UNSATISFIABLE", "None"):
+        return "unsat"
+    return "unknown"
+
+
+def kill(pid: int):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run(solver: str, path: str, expected: str, args: list[str], cpu_limit: int, memory_limit: int) -> dict:
+    """
+    Runs one instance with the limits, and returns its result record
+    """
+    def limit():
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+        if memory_limit > 0:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit << 20, memory_limit << 20))
+
+    fd, stats = tempfile.mkstemp(suffix=".json", prefix="stats-")
+    os.close(fd)
+    # files the solver writes (eg. perf-stats of --profile) go to the temporary directory, not to the repository
+    start = time.monotonic()
+    with tempfile.TemporaryFile() as out:
+        proc = subprocess.Popen(command(solver, path, args, stats), stdout=out, stderr=subprocess.DEVNULL,
+                                cwd=tempfile.gettempdir(), preexec_fn=limit, start_new_session=True)
+        # the CPU limit does not cover a process that sleeps or waits, the wall clock limit does
+        timer = threading.Timer(2 * cpu_limit + 5, kill, (proc.pid,))
+        timer.start()
+        _, status, usage = os.wait4(proc.pid, 0)
+        timer.cancel()
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        wall = time.monotonic() - start
+        out.seek(0)
+        output = out.read().decode(errors="replace")
+
+    try:
+        with open(stats, "r", encoding="utf-8") as f:
+            counters = json.load(f)
+    except (OSError, ValueError):
+        counters = {}
+    os.remove(stats)
+
+    result = answer(output)
+    cpu = usage.ru_utime + usage.ru_stime
+    if result != "unknown":
+        status = "ok" if result == expected else "wrong"
+    elif proc.returncode in (-signal.SIGXCPU, -signal.SIGKILL) or cpu >= cpu_limit:
+        status = "timeout"
+    elif "MemoryError" in output or (memory_limit > 0 and usage.ru_maxrss >= (memory_limit << 10) * 0.9):
+        status = "memout"
+    elif proc.returncode != 0:
+        status = "error"
+    else:
+        status = "unknown"
+    return {"file": path, "expected": expected, "result": result, "status": status, "wall": wall, "cpu": cpu,
+            "max_rss_kb": usage.ru_maxrss, "counters": counters}
+
+
+def load_baseline(fpath: str) -> dict:
+    """
+    Returns {"name", "solver", "gate", "results": {file: record}} of a run written by this script,
+    or of a results text file of the shell scripts (the file, then the answer and the time on their own lines)
+    """
+    with open(fpath, "r", encoding="utf-8") as f:
+        if fpath.endswith(".json"):
+            run = json.load(f)
+            return {"name": os.path.basename(fpath), "solver": run["solver"], "gate": run["solver"] == "ours",
+                    "results": {r["file"]: r for r in run["results"]}}
+        lines = [line.strip() for line in f]
+
+    results = {}
+    record = None
+    for line in lines:
+        if line.startswith("tests/"):
+            record = {"file": line, "result": "unknown", "status": "timeout", "wall": None}
+            results[line] = record
+        elif line and record is not None:
+            if record["result"] == "unknown" and line in ("sat", "unsat"):
+                record["result"] = line
+                record["status"] = "ok"
+            else:
+                try:
+                    record["wall"] = float(line)
+                except ValueError:
+                    pass
+    solver = "z3" if "z3" in os.path.basename(fpath) else "ours"
+    return {"name": os.path.basename(fpath), "solver": solver, "gate": False, "results": results}
+
+
+def compare(results: list[dict], baselines: list[dict], max_slowdown: float) -> int:
+    """
+    Prints a table of the times of the run next to every baseline (and the speedup of the run over it).
+    Returns the number of regressions against the gating baselines (marked with !)
+    """
+    regressions = 0
+    header = f"{'instance':58} {'status':8} {'time':>8}"
+    for base in baselines:
+        header += f" | {base['name'][:22]:>22} {'speedup':>8}"
+    print(header)
+    print("-" * len(header))
+
+    speedups = [[] for _ in baselines]
+    for r in results:
+        line = f"{r['file'][:58]:58} {r['status']:8} {fmt(r)}"
+        for i, base in enumerate(baselines):
+            b = base["results"].get(r["file"])
+            if b is None:
+                line += f" | {'-':>22} {'':>8}"
+                continue
+            mark = ""
+            if solved(r) and solved(b):
+                speedup = max(b["wall"], 1e-3) / max(r["wall"], 1e-3)
+                speedups[i].append(speedup)
+                if base["gate"] and r["wall"] > MIN_TIME and speedup * max_slowdown < 1:
+                    mark = " !"
+                line += f" | {fmt(b):>22} {speedup:7.2f}x{mark}"
+            else:
+                if base["gate"] and solved(b) and not solved(r):
+                    mark = " !"
+                line += f" | {fmt(b):>22} {'':>8}{mark}"
+            regressions += mark != ""
+        print(line)
+
+    print("-" * len(header))
+    summary = f"{'solved':58} {sum(solved(r) for r in results):>8} {'':>8}"
+    for i, base in enumerate(baselines):
+        solved_base = sum(solved(b) for b in base["results"].values() if b["file"] in {r["file"] for r in results})
+        mean = geometric_mean(speedups[i])
+        summary += f" | {solved_base:>22} {mean:7.2f}x" if mean else f" | {solved_base:>22} {'':>8}"
+    print(summary)
+    return regressions
+
+
+def solved(record: dict) -> bool:
+    return record["status"] == "ok" and record.get("wall") is not None
+
+
+def fmt(record: dict) -> str:
+    return f"{record['wall']:8.2f}" if solved(record) else f"{record['status']:>8}"
+
+
+def geometric_mean(values: list[float]) -> Optional[float]:
+    if not values:
+        return None
+    product = 1.0
+    for v in values:
+        product *= v
+    return product ** (1 / len(values))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the solver on the test instances and compares the run against baselines")
+    parser.add_argument("suites", nargs="*", metavar="suite", help=f"suites to run: {', '.join(SUITES)} (all by default)")
+    parser.add_argument("--solver", choices=["ours", "z3"], default="ours", help="our solver (main.py/parse-dimacs.py) or z3")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="instances to run at the same time")
+    parser.add_argument("--cpu-limit", type=int, default=60, metavar="SECONDS", help="CPU time limit of an instance")
+    parser.add_argument("--memory-limit", type=int, default=4096, metavar="MB", help="address space limit of an instance (0 for none)")
+    parser.add_argument("--args", default="", help="arguments passed on to the solver, eg. \"--online\"")
+    parser.add_argument("--output", metavar="FILE", help="JSON file to write the run to (default: results-<solver>-<time>.json)")
+    parser.add_argument("--baseline", nargs="+", default=[], metavar="FILE",
+                        help="runs to compare against, JSON files of this script or the results text files of the old scripts")
+    parser.add_argument("--max-slowdown", type=float, default=1.5, metavar="FACTOR",
+                        help="an instance that is slower than in a baseline of our solver by more than this is a regression")
+    args = parser.parse_args()
+
+    suites = args.suites or list(SUITES)
+    for suite in suites:
+        if suite not in SUITES:
+            parser.error(f"unknown suite {suite}, the suites are {', '.join(SUITES)}")
+    extra = shlex.split(args.args)
+    todo = instances(suites)
+    print(f"{len(todo)} instances, {args.jobs} jobs, {args.cpu_limit}s CPU limit", file=sys.stderr)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(run, args.solver, path, expected, extra, args.cpu_limit, args.memory_limit) for path, expected in todo]
+        for future in futures:
+            r = future.result()
+            results.append(r)
+            print(f"{r['file']:60} {r['status']:8} {r['wall']:8.2f}", file=sys.stderr)
+
+    output = args.output or f"results-{args.solver}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"solver": args.solver, "args": args.args, "suites": suites, "cpu_limit": args.cpu_limit,
+                   "memory_limit": args.memory_limit, "date": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}, f, indent=1)
+    print(f"wrote {output}", file=sys.stderr)
+
+    wrong = [r["file"] for r in results if r["status"] == "wrong"]
+    regressions = compare(results, [load_baseline(b) for b in args.baseline], args.max_slowdown) if args.baseline else 0
+    for w in wrong:
+        print(f"WRONG: {w}")
+    if wrong or regressions:
+        print(f"{len(wrong)} wrong answers, {regressions} regressions")
+        sys.exit(1)
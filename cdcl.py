@@ -1,7 +1,12 @@
 import sys
 
-from Model import Model
+from Model import Model, THEORY_REASON
 from Clause import Clause
+from Watches import Watches
+from ClauseDB import ClauseDB
+from Restart import make_restart_policy
+from Theory import Theory
+from Stats import Stats
 from typing import *
 
 """
@@ -9,7 +14,7 @@ The main file that gives an assignment to a Propositional Boolean Logic formula
 or returns UNSAT
 """
 
-def solve (clause_set: list[Clause], literals: int) -> Optional[Clause]:
+def solve (clause_set: Union[list[Clause], ClauseDB], literals: int, restart: str = "luby", stats: Optional[Stats] = None) -> Optional[list[int]]:
     """
     The solver takes a formula or the clause_set
     of a list of lists. The inner list are the set of literals.
@@ -20,108 +25,363 @@ def solve (clause_set: list[Clause], literals: int) -> Optional[Clause]:
 
     Currently working off of slide 30 in https://homepage.divms.uiowa.edu/~tinelli/classes/4980/Spring24/notes/06-dpll-cdcl.pdf
 
+    clause_set can also be a ClauseDB, which then keeps the clauses learned by this call
+    restart names the restart policy (see Restart.RESTART_POLICIES), stats collects the counters of the search
+    For repeated calls on a growing clause set use a Solver instead
+
     Returns a satisfying list of assignments if there exists one
-    If the clause set is unsatisfiable, return [0]
+    If the clause set is unsatisfiable, return None
     """
 
-    model = Model(literals)
-    conflict_clause = None
-
-    #print(f"Clauses: {list(map(lambda x: x.to_list(), clause_set))}")
-    return solve_helper((clause_set,[]), model)
+    if isinstance(clause_set, ClauseDB):
+        solver = Solver(literals, restart=restart, db=clause_set, stats=stats)
+    else:
+        solver = Solver(literals, clause_set, restart=restart, stats=stats)
 
+    return solver.solve()
 
 
-                              #unresolved   #satisfied
-def solve_helper(clause_set: (list[Clause], list[Clause]), model: Model) -> Optional[Clause]:
+class Solver:
     """
-    The solver runs in the following manner:
-    1. Checks if we have have unresolved clauses (If no, we have a satisfying model)
-    2. Unit propagates clauses which we can (go to step 1)
-    -- No unit propagation possible and we still have unresolved clauses then do step 3
-    3. Decide on a literal
-    4. Check for conflicts
-    5. If there is a conflict, compute the conflict clause
-    6. Learn the conflict clause, and backjump
-    7. go to step 1
+    Incremental CDCL solver.
+    The solver object lives across calls: clauses can be added between calls to solve, and the
+    learned clauses, variable activities and saved phases of earlier calls are kept.
+    solve takes assumptions (literals that are decided first, on levels 1..len(assumptions));
+    if the clause set is unsat under them, failed holds the assumptions that were responsible.
+    With a theory, the search is DPLL(T): the theory is kept in sync with the trail and checked after
+    every propagation, and its conflicts are learned from like any other conflict. The literals the theory
+    implies are put on the trail after every consistent check, their explanations are only turned into
+    theory clauses when the conflict analysis gets to them.
+    seed, phase and var_decay diversify the search (see Model); with share (a ClauseRing.Share) the solver
+    is a worker of a portfolio that exports its short learned clauses and imports the ones of the others at level 0.
+    stats (a Stats) gets the counters of the search and the time of the theory checks.
     """
+    def __init__(self, literals: int, clause_set: Iterable[Union[Clause, Sequence[int]]] = (), restart: str = "luby", db: Optional[ClauseDB] = None,
+                 theory: Optional[Theory] = None, seed: Optional[int] = None, phase: bool = True, var_decay: float = 0.95, share=None,
+                 stats: Optional[Stats] = None):
+        self.size = literals
+        self.db = ClauseDB() if db is None else db
+        self.model = Model(literals, phase, var_decay, seed)
+        self.watches = Watches(literals, self.db.arena)
+        self.restart_policy = make_restart_policy(restart)
+        self.theory = theory
+        if theory is not None:
+            self.model.explainer = self.explain_implied
+        self.share = share
+        self.stats = Stats() if stats is None else stats
+        # trail index where each theory level starts, mirrors model.trail_lim up to model.theory_head
+        self.theory_lim = []
+        # true once the clause set is unsat without any assumptions
+        self.unsat = False
+        self.failed = []
+
+        for c in self.db:
+            if not self.watches.add_clause(c, self.model):
+                self.unsat = True
+
+        for clause in clause_set:
+            self.add_clause(clause)
+
+    def __str__(self):
+        return f"Solver(vars: {self.size}, {self.db})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def add_clause(self, clause: Union[Clause, Sequence[int]], theory: bool = False) -> bool:
+        """
+        Adds a clause (a theory clause if theory is true, which the clause database may delete later).
+        The clause is simplified by the level 0 assignment first: satisfied clauses are dropped,
+        and so are the literals that are false. Duplicate clauses are dropped as well, and theory
+        clauses that are subsumed by a clause of the database.
+        Returns False if the clause set became unsat
+        """
+        if self.unsat:
+            return False
 
-    # print(f"Start of solver: {model}\n{clause_set[0]}")
-
-    (unresolved_clauses, satisfied_clauses) = clause_set
-    conflict_clause = None
-    total_len = len(unresolved_clauses)
-
-    # TODO: once restart is done, use restart instead of while true
-    while len(unresolved_clauses) > 0 or conflict_clause is not None:
-        #print(f"Model:\n{model.to_list()}\nUnresolved:\n{list(map(lambda x: x.to_list(), unresolved_clauses))}\nmodel complete:{model.is_complete()}\nconflict clause: {None if conflict_clause is None else conflict_clause.to_list()}")
-
-        # run unit propagation as much as possible
-        #####
-        # Step 1.
-        #####
-
-        if conflict_clause is None:
-            assert len(unresolved_clauses) + len(satisfied_clauses) == total_len, f"{(len(unresolved_clauses), len(satisfied_clauses), total_len)}"
-            #print(f"unresolved clauses {len(unresolved_clauses), len(satisfied_clauses)}")
-            (unresolved_clauses, new_unit_clauses, conflict_clause) = propagate_possible(unresolved_clauses, model)
-            satisfied_clauses.extend(new_unit_clauses)
-           # print(f"new unit clauses: {new_unit_clauses}")
-            if len(new_unit_clauses) > 0:
-                # it is possible that this propagate makes other unresolved clauses unit
-                continue
+        model = self.model
+        model.backjump(0)
 
-            ####
-            # Step 3
-            ####
-            # run decide as no propagation possible
-            if not model.is_complete():
-                model.decide()
-            else:
-                unresolved_clauses, new_sat_clauses, conflict_clause = model.check_clauses(unresolved_clauses)
-                satisfied_clauses.extend(new_sat_clauses)
+        literals = []
+        for lit in dict.fromkeys(clause.to_list() if isinstance(clause, Clause) else clause):
+            lit = int(lit)
+            if model.has(lit) or -1 * lit in literals:
+                # satisfied or a tautology
+                return True
+            if not model.has(-1 * lit):
+                literals.append(lit)
+
+        if len(literals) == 0:
+            self.unsat = True
+            return False
+
+        if self.db.subsumes(literals) if theory else self.db.contains(literals):
+            return True
+
+        c = self.db.add_theory(literals) if theory else self.db.add(literals)
+        if len(literals) == 1:
+            model.add(literals[0], c)
         else:
-            #print("can no longer propogate")
-            ####
-            # Step 4.
-            ####
+            self.watches.watch(c)
+
+        return True
+
+    def solve(self, assumptions: Sequence[int] = ()) -> Optional[list[int]]:
+        """
+        The solver runs in the following manner:
+        1. Unit propagates the literals on the trail through the watch lists, then checks the theory (if any)
+        2. If there is no conflict, restart if the restart policy says so
+        3. If there is no conflict, decide on the next assumption, or stop if it is false
+        4. If there is no conflict and the model is complete we have a satisfying model
+        5. If there is no conflict, decide on a literal (go to step 1)
+        6. If there is a conflict, compute the conflict clause
+        7. Learn the conflict clause, and backjump (go to step 1)
+        8. Every so many conflicts, delete the learned clauses of low value (go to step 1)
+
+        Returns a satisfying list of assignments, or None if the clause set is unsat under the assumptions
+        (failed is empty if it is unsat without them)
+        """
+        self.failed = []
+        if self.unsat:
+            return None
+
+        db, model, watches, restart_policy, stats = self.db, self.model, self.watches, self.restart_policy, self.stats
+        assumptions = [int(lit) for lit in assumptions]
+        model.backjump(0)
+
+        while True:
+            #####
+            # Step 1.
+            #####
+            head = model.qhead
+            conflict_clause = watches.propagate(model)
+            stats.propagations += model.qhead - head
+            theory_conflict = False
+            if conflict_clause is None and self.theory is not None:
+                conflict_clause = self.theory_check(model.is_complete())
+                theory_conflict = conflict_clause is not None
+                if not theory_conflict and self.theory_propagate():
+                    # propagate the implied literals through the clauses first
+                    continue
+
+            if conflict_clause is None:
+                #####
+                # Step 2.
+                #####
+                if restart_policy.should_restart():
+                    # the saved phases survive the restart
+                    model.backjump(0)
+                    restart_policy.restarted()
+                    stats.restarts += 1
+
+                if self.share is not None and model.decision_level() == 0:
+                    if self.import_shared():
+                        # propagate the imported clauses first
+                        continue
+                    if self.unsat:
+                        return None
+
+                #####
+                # Step 3.
+                #####
+                next_lit = 0
+                while model.decision_level() < len(assumptions):
+                    lit = assumptions[model.decision_level()]
+                    if model.has(lit):
+                        # already true, keep the levels in line with the assumptions
+                        model.new_level()
+                    elif model.has(-1 * lit):
+                        self.failed = self.analyze_final(lit)
+                        model.backjump(0)
+                        return None
+                    else:
+                        next_lit = lit
+                        break
+
+                if next_lit != 0:
+                    model.add_decide(next_lit)
+                    continue
+
+                #####
+                # Step 4.
+                #####
+                if model.is_complete():
+                    break
+
+                ####
+                # Step 5
+                ####
+                model.decide()
+                stats.decisions += 1
+                continue
+
+            stats.conflicts += 1
+            if stats.conflicts >= stats.next_poll:
+                stats.poll()
 
             # if there's a failing clause and there are no decides left to reverse in the model
             # return UNSAT
             if not model.has_decide():
-                #print(f"Unsat Model:\n{model}\nConflicting Clause:\n{conflict_clause}")
+                self.unsat = True
                 return None
 
-
             #####
-            # Step 5
+            # Step 6
             #####
-            #print(f"Before explain\n{conflict_clause.to_list()}")
-            conflict_clause = explain(unresolved_clauses + satisfied_clauses, model, conflict_clause)
-            #print(f"Conflicting clause:\n{conflict_clause.to_list()} {len(conflict_clause.to_list())}")
-            #print(f"Expalined conflicting clause:\n{conflict_clause}")
-            # print(f"Explain:\n{conflict_clause}\ndelta:{unresolved_clauses + satisfied_clauses}\n---\n")
-            for clause in unresolved_clauses + satisfied_clauses:
-                if conflict_clause and clause.eq(conflict_clause):
-                    # we have learned this clause already, so we have to have unsat at this point
-                    print(f"WTF;trying to add a learned clause again\n{conflict_clause}in\n{unresolved_clauses + satisfied_clauses}")
-                    return None
+            conflict_clause, backjump_level = explain(model, conflict_clause, db)
+            # without a theory, a clause of the database would have propagated before the conflict; the theory
+            # clauses are not (an explanation is watched when the conflict analysis gets to it, and can miss
+            # a propagation after a backjump), so with a theory the same clause may be derived again
+            assert self.theory is not None or not db.contains(conflict_clause), \
+                f"learned clause {conflict_clause} is in the clause database already"
 
             #####
-            # Step 6
+            # Step 7
             #####
-            unresolved_clauses = learn_backjump(unresolved_clauses + satisfied_clauses, model, conflict_clause)
-            unresolved_clauses, satisfied_clauses, conflict_clause = model.check_clauses(unresolved_clauses)
-            assert conflict_clause is None
-            #conflict_clause = None
-            #print(f"after backjump: {unresolved_clauses}\nModel:\n{model}")
-
+            lbd = model.lbd(conflict_clause)
+            restart_policy.on_conflict(lbd)
+            if self.share is not None:
+                self.share.export(conflict_clause, lbd)
+            stats.learn(len(conflict_clause))
+            learn_backjump(db, model, conflict_clause, lbd, backjump_level, watches)
 
-    # We have a model which satisfies all the clauses
-    assert conflict_clause is None, f"conflict clause is not None {conflict_clause}"
-    assert len(unresolved_clauses) == 0, f"unresolved clauses {unresolved_clauses}"
+            #####
+            # Step 8
+            #####
+            if db.on_conflict():
+                db.reduce(model, watches)
+
+        return model.to_list()
+
+    def import_shared(self) -> int:
+        """
+        Adds the clauses the other workers shared since the last call as learned clauses, simplified
+        by the level 0 assignment (the model has to be at level 0).
+        Returns the number of clauses added, unsat is set if one of them is false
+        """
+        db, model = self.db, self.model
+        added = 0
+        for clause in self.share.fetch():
+            literals = []
+            for lit in clause:
+                if model.has(lit):
+                    break
+                if not model.has(-1 * lit):
+                    literals.append(lit)
+            else:
+                if len(literals) == 0:
+                    self.unsat = True
+                    return 0
+                if db.contains(literals):
+                    continue
+                c = db.add_learned(literals, min(len(literals), self.share.lbd))
+                if len(literals) == 1:
+                    model.add(literals[0], c)
+                else:
+                    self.watches.watch(c)
+                added += 1
+        return added
+
+    def theory_check(self, final: bool) -> Optional[int]:
+        """
+        Tells the theory about the literals of the trail it has not seen yet, popping the theory levels
+        the model has backjumped over and pushing one for every new decision level, then checks it.
+        A theory conflict is added as a theory clause (watched on its literals of the highest levels),
+        and the model is backjumped to the highest level in it, so that it is explained like any other conflict.
+        Returns the index of the conflict clause, or None if the theory is consistent with the model
+        """
+        model, theory, theory_lim = self.model, self.theory, self.theory_lim
+        trail, trail_lim, level = model.trail, model.trail_lim, model.level
+        head = model.theory_head
+
+        levels = 0
+        while theory_lim and theory_lim[-1] >= head:
+            theory_lim.pop()
+            levels += 1
+        if levels:
+            theory.pop(levels)
+
+        for i in range(head, len(trail) + 1):
+            while len(theory_lim) < len(trail_lim) and trail_lim[len(theory_lim)] <= i:
+                theory_lim.append(trail_lim[len(theory_lim)])
+                theory.push()
+            if i < len(trail):
+                theory.assert_lit(trail[i])
+        model.theory_head = len(trail)
+
+        with self.stats.timer("theory"):
+            conflict = theory.check(final)
+        if conflict is None:
+            return None
+
+        conflict.sort(key=lambda lit: level[abs(lit)], reverse=True)
+        c = self.db.add_theory(conflict)
+        if len(conflict) > 1:
+            self.watches.watch(c)
+        model.backjump(level[abs(conflict[0])] if conflict else 0)
+        return c
+
+    def theory_propagate(self) -> int:
+        """
+        Puts the literals the theory implies (that are not assigned yet) on the trail, with THEORY_REASON as their reason.
+        Returns the number of literals added
+        """
+        model = self.model
+        added = 0
+        for lit in self.theory.propagate():
+            if not model.has(lit) and not model.has(-1 * lit):
+                model.add(lit, THEORY_REASON)
+                added += 1
+        self.stats.theory_propagations += added
+        return added
+
+    def explain_implied(self, v: int) -> int:
+        """
+        Adds the explanation of the implied literal of variable v as a theory clause, and makes it the reason of the literal.
+        The clause is watched on the implied literal and a literal of the highest level of the others.
+        Returns the index of the clause
+        """
+        model = self.model
+        lit = v if model.has(v) else -1 * v
+        clause = self.theory.explain(lit)
+        level = model.level
+        clause[1:] = sorted(clause[1:], key=lambda q: level[abs(q)], reverse=True)
+        c = self.db.add_theory(clause)
+        if len(clause) > 1:
+            self.watches.watch(c)
+        model.reason[v] = c
+        return c
+
+    def analyze_final(self, lit: int) -> list[int]:
+        """
+        Returns the assumptions that imply the negation of the assumption lit (lit included),
+        by following the reasons of -lit back to the assumption decisions
+        """
+        model = self.model
+        failed = [lit]
+        if model.decision_level() == 0:
+            return failed
+
+        trail, reason, level, seen = model.trail, model.reason, model.level, model.seen
+        arena = self.db.arena
+        seen[abs(lit)] = 1
+        for i in range(len(trail) - 1, model.trail_lim[0] - 1, -1):
+            v = abs(trail[i])
+            if not seen[v]:
+                continue
+            if reason[v] is None:
+                # every decision below the assumptions is an assumption
+                failed.append(trail[i])
+            else:
+                if reason[v] == THEORY_REASON:
+                    model.explainer(v)
+                for q in arena.literals(reason[v]):
+                    if level[abs(q)] > 0:
+                        seen[abs(q)] = 1
+            seen[v] = 0
+        seen[abs(lit)] = 0
 
-    return model.to_list()
+        return failed
 
 """
 1 |-> x + y <= 0
@@ -160,99 +420,148 @@ def check_falsify(clause_set: list[Clause], model: Model) -> Optional[Clause]:
     return None
 
 
-def propagate_possible(unresolved_clauses: list[Clause], model: Model) -> (list[Clause], list[Clause], Optional[Clause]):
+def explain(model: Model, conflict_clause: int, db: ClauseDB) -> (list[int], int):
     """
-    Finds a unit literal and splits unresolved_clauses into resolved and unresolved clauses
-    The model parameter is modified by the function
+    First UIP conflict analysis.
+    Resolves the conflict clause with the reasons of the literals of the current level,
+    walking the trail backwards, until a single literal of the current level is left (the first UIP).
+    Only the reasons of the literals that are touched are looked at, not the clause set,
+    and their activity is bumped in the clause database.
+    The learned clause is then minimized by dropping the literals that are implied by the others.
+
+    Returns the literals of the learned clause, with the asserting literal first and a literal of the
+    backjump level second, and the backjump level
     """
-
-    #print(f"unresolved clauses {unresolved_clauses}")
-    literal = None
-    for clause in unresolved_clauses:
-        literal = model.makes_unit(clause)
-
-        if literal is not None:
-            model.add(literal)
-            #print(f"Propagating {literal}...")
-            return model.check_clauses(unresolved_clauses)
-            # print("no Prop")
-    return model.check_clauses(unresolved_clauses)
-
-def explain(clause_set: list[Clause], model: Model, conflict_clause: Clause) -> Clause:
+    trail, level, reason, seen = model.trail, model.level, model.reason, model.seen
+    arena = db.arena
+    lits, start, sizes, flags = arena.mv_lits, arena.mv_start, arena.mv_size, arena.mv_flags
+    current_level = model.decision_level()
+
+    learnt = [0]
+    counter = 0
+    index = len(trail) - 1
+    p = 0
+    c = conflict_clause
+
+    while True:
+        if flags[c]:
+            db.bump(c, model)
+        s = start[c]
+        for k in range(s, s + sizes[c]):
+            q = lits[k]
+            v = abs(q)
+            if v == p:
+                continue
+            if not seen[v] and level[v] > 0:
+                seen[v] = 1
+                if level[v] >= current_level:
+                    counter += 1
+                else:
+                    learnt.append(q)
+
+        # next literal of the current level to resolve on
+        while not seen[abs(trail[index])]:
+            index -= 1
+        p = abs(trail[index])
+        index -= 1
+        c = reason[p]
+        seen[p] = 0
+        counter -= 1
+        if counter == 0:
+            break
+        if c == THEORY_REASON:
+            # adding the explanation may grow the arena
+            c = model.explainer(p)
+            lits, start, sizes, flags = arena.mv_lits, arena.mv_start, arena.mv_size, arena.mv_flags
+
+    learnt[0] = -1 * trail[index + 1]
+
+    # recursive minimization, a literal is redundant if its reason only has literals
+    # that are in the learned clause or redundant themselves
+    to_clear = learnt[1:]
+    abstract = 0
+    for q in to_clear:
+        abstract |= 1 << (level[abs(q)] & 31)
+
+    minimized = [learnt[0]]
+    for q in learnt[1:]:
+        if reason[abs(q)] is None or not redundant(model, arena, q, abstract, to_clear):
+            minimized.append(q)
+
+    for q in to_clear:
+        seen[abs(q)] = 0
+
+    # put a literal of the highest level after the asserting literal, that is where we backjump to
+    backjump_level = 0
+    if len(minimized) > 1:
+        highest = 1
+        for i in range(2, len(minimized)):
+            if level[abs(minimized[i])] > level[abs(minimized[highest])]:
+                highest = i
+        minimized[1], minimized[highest] = minimized[highest], minimized[1]
+        backjump_level = level[abs(minimized[1])]
+
+    return (minimized, backjump_level)
+
+
+def redundant(model: Model, arena, lit: int, abstract: int, to_clear: list[int]) -> bool:
     """
-    Modifies the conflict clause
+    Returns true if the (false) literal is implied by the literals marked as seen,
+    following reasons with an explicit stack instead of recursion.
+    abstract is a bit set of the levels in the learned clause, a literal from any other level can not be redundant.
+    Newly seen literals are recorded in to_clear, or unmarked again if lit is not redundant
     """
+    level, reason, seen = model.level, model.reason, model.seen
+    lits, start, sizes = arena.mv_lits, arena.mv_start, arena.mv_size
+    stack = [lit]
+    top = len(to_clear)
+
+    while stack:
+        v = abs(stack.pop())
+        c = reason[v]
+        if c == THEORY_REASON:
+            c = model.explainer(v)
+            lits, start, sizes = arena.mv_lits, arena.mv_start, arena.mv_size
+        s = start[c]
+        for k in range(s, s + sizes[c]):
+            q = lits[k]
+            u = abs(q)
+            if u == v or seen[u] or level[u] == 0:
+                continue
+            if reason[u] is not None and (1 << (level[u] & 31)) & abstract:
+                seen[u] = 1
+                stack.append(q)
+                to_clear.append(q)
+            else:
+                for x in to_clear[top:]:
+                    seen[abs(x)] = 0
+                del to_clear[top:]
+                return False
 
-    cc_lits = conflict_clause.to_list()
-    cc_lits.sort(key = lambda x: model.literal_lvls[-1*x])
-    cc_lits.reverse()
-    #print(f"conflict_clause: {conflict_clause.to_list()}")
-    for lit in cc_lits:
-        restof_cc =  Clause(conflict_clause.size, cc_lits)
-        restof_cc.remove(lit)
-
-        pivot = -1 * lit
-
-        clauses_with_negl = list(filter(lambda x: x.has(pivot), clause_set))
-        #print(f"\n---\nModel:\n{model.to_list()}\ndelta:\n{clause_set}\nconflict_clause:\n{cc_lits}")
-        #print(f"d:\n{restof_cc.to_list()}\nclauses with {pivot}:\n{list(map(lambda x: x.to_list(), clauses_with_negl))}")
-        
-        # print(f"model: {model.to_list()}")
-
-        for c in clauses_with_negl:
-
-            copy_c = Clause(c.size)
-            copy_c.copy(c)
-            # print(f"copy_c: {copy_c}")
-            copy_c.remove(pivot)
-            neg_c = copy_c.negated()
-            # print(f"candidate:\n{neg_c}")
-
-            if model.contains_clause(neg_c):
-                # print(f"m satisfies:\n{neg_c}\n---")
-
-                restof_cc.data |= copy_c.data
-
-                i = 1
-                while i <= restof_cc.size:
-                    if restof_cc.has(i) and restof_cc.has(-1*i):
-                        continue
-                    i += 1
-                #print(f"new_explain_clause:\n{restof_cc.to_list()}")
-                return restof_cc
-    
+    return True
 
 
-def learn_backjump(clause_set: list[Clause], model: Model, conflict_clause: Clause):
+def learn_backjump(db: ClauseDB, model: Model, learned: list[int], lbd: int, backjump_level: int, watches: Watches) -> int:
     """
-    adds clauses from the conflict_clause to the clause_set
-    computes where to backjump and performs the backjump
+    adds the learned clause to the clause database
+    performs the backjump and adds the asserting literal (the first literal of the clause)
+    the learned clause is watched on the asserted literal and the literal of the backjump level
+    Returns the index of the learned clause
     """
-    assert conflict_clause is not None
-
-    #print(f"In L&B Model:\n{model.to_list()}\ncc:\n{conflict_clause.to_list()}")
-
-    levels = list(map(lambda x: (x, model.compute_level(-1*x)), conflict_clause.to_list()))
-    #print(f"levels:{levels}")
-    levels.sort(key=lambda x: x[1])
-    backjump_level = levels[-2][1] if len(levels) > 1 else levels[0][1] - 1
-    p_literal = levels[-1][0]
-
-    #print(f"backjumping, level:{backjump_level} lit:{p_literal}")
-
-    current = model.to_list()
+    assert learned is not None
 
-    model.data = model.data[:backjump_level] if backjump_level > 0 else [model.data[0]]
+    model.bump(learned)
+    model.heap.decay()
+    db.decay()
+    model.backjump(backjump_level)
 
-    for literal in current:
-        if not model.has(literal):
-            del model.literal_lvls[literal]
+    c = db.add_learned(learned, lbd)
+    if len(learned) > 1:
+        watches.watch(c)
 
-    # print(f"Model:{model.data}")
-    model.add(p_literal)
-    #clause_set.append(conflict_clause)
+    model.add(learned[0], c)
 
-    return clause_set
+    return c
 
 
 """
@@ -8,11 +8,25 @@ from pysmt.typing import REAL
 from pysmt.exceptions import NoSolverAvailableError
 
 from IO import read_input
-from cdcl import solve
+from Tseitin import read_skeleton
+from cdcl import Solver as SatSolver
+from Restart import RESTART_POLICIES
+from Theory import make_theory, is_theory_atom, shared_symbols, THEORIES, CORE_EXTRACTIONS
+from Cores import CoreMinimizer, CORE_MINIMIZATIONS
+from TheoryCache import TheoryCache
+from SkeletonCache import SkeletonCache, Atoms
+from Preprocessor import Preprocessor
+from BoundLemmas import BoundLemmas
+from Portfolio import Portfolio, UNKNOWN
+from Pipeline import TheoryPool, diverting, COUNTERS, STREAK
+from Stats import Stats
 
 import sys
+import argparse
+from contextlib import nullcontext
 from os.path import exists, basename
 import time
+import numpy as np
 from Model import Model
 from Clause import Clause
 
@@ -20,9 +34,6 @@ import cProfile, pstats, io
 from pstats import SortKey
 
 
-pr = cProfile.Profile()
-
-
 def build_skeleton_map(formula):
     """
     Builds map to represent each literal.
@@ -58,16 +69,14 @@ def build_skeleton(formula, atom_map):
 
 def build_skeleton_clause(clause, atom_map):
     clause_skeleton = []
-    # Each clause is either a literal, negated literal
-    if len(clause.args()) == 0:
-            # this is a singleton clause so just append its lookup
-            clause_skeleton.append(atom_map[clause])
-    else:
-        for literal in clause.args():
-            if literal.is_not():
-                clause_skeleton.append(-1 * atom_map[literal.arg(0)])
-            else: clause_skeleton.append(atom_map[literal])
-        clause_skeleton.sort()
+    # Each clause is either a disjunction of literals, or a singleton clause that is
+    # a literal or negated literal itself (whose args are not literals, eg. Not(D) or x <= y)
+    literals = clause.args() if clause.is_or() else [clause]
+    for literal in literals:
+        if literal.is_not():
+            clause_skeleton.append(-1 * atom_map[literal.arg(0)])
+        else: clause_skeleton.append(atom_map[literal])
+    clause_skeleton.sort()
     return clause_skeleton
 
 def build_formula(skeleton, atom_map):
@@ -96,24 +105,318 @@ def build_formula(skeleton, atom_map):
         clauses.append(Or(atoms))
     return And(clauses)
 
+def search_online(problem_size, clause_set, atoms, cache, stats, theory="simplex", theory_options={}, **options) -> str:
+    """
+    DPLL(T): the theory solver (see Theory.make_theory) is kept in sync with the search and checked on
+    partial assignments, theory conflicts are learned from inside the same search.
+    theory_options go to the theory solver, options to the SAT solver. Returns sat or unsat
+    """
+    with make_theory(theory, atoms.atom_map, atoms.atom_rev, cache=cache, stats=stats, **theory_options) as tsolver:
+        ssolver = SatSolver(problem_size, clause_set, theory=tsolver, stats=stats, **options)
+        with stats.timer("sat"):
+            model = ssolver.solve()
+        result = "unsat" if model is None else "sat"
+    stats.update(theory_solver=type(tsolver).__name__)
+    stats.update(theory_clauses=len(ssolver.db.theory), deleted=ssolver.db.deleted, cache_misses=cache.misses)
+    return result
+
+def search_lazy(problem_size, clause_set, theory_atoms, atoms, cache, stats, theory="simplex", theory_options={}, rounds=5000, **options) -> str:
+    """
+    Offline lazy SMT: the theory solver (see Theory.make_theory) checks the complete Boolean models of the
+    SAT solver, and every inconsistent one is blocked by the negation of its (minimized) unsat core.
+    theory_options go to the theory solver, options to the SAT solver. Returns sat, unsat, or unknown after the given number of rounds
+    """
+    # the SAT solver keeps its learned clauses, activities and phases between the rounds,
+    # the blocking clauses are added to it incrementally
+    ssolver = SatSolver(problem_size, clause_set, stats=stats, **options)
+    result = UNKNOWN
+    # the theory solver only sees the arithmetic atoms of the Boolean model, and the checks of
+    # projected models that were already decided are answered by the cache
+    with make_theory(theory, atoms.atom_map, atoms.atom_rev, partial=False, stats=stats, **theory_options) as tsolver:
+        count = rounds
+        while count > 0:
+            count -= 1
+            with stats.timer("sat"):
+                sat_model = ssolver.solve()
+            if stats.progress:
+                stats.poll()
+            if sat_model is None:
+                result = "unsat"
+                break
+            #print(f"sat model {sat_model}")
+            with stats.timer("theory"):
+                key = TheoryCache.key(sat_model[i - 1] for i in theory_atoms)
+                hit = cache.lookup(key)
+                if hit is None:
+                    # one level per check, the literals of the model are asserted one by one
+                    # so that the unsat core is a set of literals
+                    tsolver.push()
+                    for l in key:
+                        tsolver.assert_lit(l)
+                    conflict = tsolver.check(True)
+                    if conflict is None:
+                        hit = (True, ())
+                    else:
+                        hit = (False, [-1 * l for l in conflict])
+                    tsolver.pop(1)
+                    cache.store(key, *hit)
+                else:
+                    stats.cache_hits += 1
+
+            consistent, core = hit
+            if consistent:
+                result = "sat"
+                break
+
+            blocking_clause_skeleton = sorted(-1 * l for l in core)
+            blocking_clause = Clause(problem_size, init=blocking_clause_skeleton)
+            #print(f"Blocking clause: {blocking_clause.to_list()}")
+            # duplicate and subsumed blocking clauses are dropped by add_clause
+            stats.blocking_clauses += 1
+            ssolver.add_clause(blocking_clause, theory=True)
+        stats.update(theory_solver=type(tsolver).__name__)
+    stats.update(rounds=rounds - count, theory_clauses=len(ssolver.db.theory), deleted=ssolver.db.deleted, cache_misses=cache.misses)
+    return result
+
+def search_pipelined(problem_size, clause_set, theory_atoms, atoms, cache, stats, theory="simplex", theory_options={}, workers=2,
+                     backlog=None, rounds=5000, **options) -> str:
+    """
+    Pipelined lazy SMT: a pool of theory workers (see Pipeline.TheoryPool) checks the complete Boolean models
+    of the SAT solver while it searches for the next ones. Up to backlog candidates (one per worker by default)
+    wait for an idle worker; the SAT solver finds each new one under assumptions that exclude the pending ones
+    (see Pipeline.diverting), and waits for an answer once the backlog is full or no other model is left.
+    The answers are merged as they arrive: a consistent candidate is the answer sat, an inconsistent one is
+    blocked by the negation of its (minimized) unsat core, and the waiting candidates that contain a core are
+    dropped, before a worker checks them. Where the candidates keep sharing their cores, fewer of them are
+    pending at once (down to one, as in search_lazy). A round is a candidate that a worker or the cache answered,
+    the dropped ones are not counted.
+    theory_options go to the theory solvers, options to the SAT solver. Returns sat, unsat, or unknown after the given number of rounds
+    """
+    ssolver = SatSolver(problem_size, clause_set, stats=stats, **options)
+    backlog = workers if backlog is None else backlog
+    result = UNKNOWN
+
+    def make():
+        # the workers build their theory solvers after the fork, and count into their own stats
+        options = dict(theory_options, stats=Stats())
+        minimizer = options.get("minimizer")
+        if minimizer is not None:
+            options["minimizer"] = CoreMinimizer(minimizer.strategy, minimizer.budget, minimizer.cache_size, options["stats"])
+        return make_theory(theory, atoms.atom_map, atoms.atom_rev, partial=False, **options)
+
+    atoms.load()
+    # variable -> the number of cores it was in
+    weight = [0] * (problem_size + 1)
+    # the candidates that wait for an idle worker, in the order they were found
+    waiting = []
+    dropped = 0
+    # how many candidates may be pending (checked or waiting) at once: one less for every candidate that a core
+    # of another one refuted, before its check (dropped) or after it (wasted), one more after STREAK useful checks
+    # in a row per pending candidate, so the search only runs ahead as far as the candidates have cores of their own
+    ahead = workers + backlog
+    useful = wasted = 0
+
+    def refuted(n):
+        nonlocal ahead, useful
+        if n > 0:
+            ahead = max(1, ahead - n)
+            useful = 0
+
+    count = rounds
+    with TheoryPool(workers, make) as pool:
+        while result == UNKNOWN:
+            # hand the waiting candidates to the idle workers, unless a core refutes them by now
+            while waiting and pool.idle() and count > 0:
+                key = waiting.pop(0)
+                hit = cache.lookup(key)
+                if hit is None:
+                    pool.submit(key)
+                    count -= 1
+                elif hit[0]:
+                    result = "sat"
+                    break
+                else:
+                    dropped += 1
+                    refuted(1)
+            if result != UNKNOWN:
+                break
+
+            found = False
+            pending = [key for key in pool.busy if key is not None] + waiting
+            if len(waiting) < backlog and len(pending) < ahead and count > len(waiting):
+                with stats.timer("sat"):
+                    sat_model = ssolver.solve(diverting(pending, weight))
+                if stats.progress:
+                    stats.poll()
+                if sat_model is None:
+                    if not ssolver.failed:
+                        result = "unsat"
+                        break
+                    # otherwise every model left is one of the pending candidates
+                else:
+                    found = True
+                    key = TheoryCache.key(sat_model[i - 1] for i in theory_atoms)
+                    hit = cache.lookup(key) if key else (True, ())
+                    if hit is None:
+                        waiting.append(key)
+                    else:
+                        stats.cache_hits += 1
+                        count -= 1
+                        consistent, core = hit
+                        if consistent:
+                            result = "sat"
+                            break
+                        stats.blocking_clauses += 1
+                        ssolver.add_clause(sorted(-1 * l for l in core), theory=True)
+            if pool.idle() == workers:
+                if found:
+                    continue
+                # the rounds are used up, the waiting candidates can not be checked anymore
+                break
+
+            with stats.timer("theory"):
+                answers = pool.results(block=not found)
+            for key, conflict in answers:
+                if conflict is None:
+                    cache.store(key, True)
+                    result = "sat"
+                    break
+                core = [-1 * l for l in conflict]
+                cache.store(key, False, core)
+                for l in core:
+                    weight[abs(l)] += 1
+                # duplicate and subsumed blocking clauses are dropped by add_clause
+                stats.blocking_clauses += 1
+                learned = len(ssolver.db.theory)
+                ssolver.add_clause(sorted(conflict), theory=True)
+                if len(ssolver.db.theory) == learned:
+                    wasted += 1
+                    refuted(1)
+                else:
+                    useful += 1
+                    if useful >= STREAK * ahead:
+                        ahead = min(workers + backlog, ahead + 1)
+                        useful = 0
+                blocked = frozenset(core)
+                kept = [k for k in waiting if not blocked.issubset(k)]
+                dropped += len(waiting) - len(kept)
+                refuted(len(waiting) - len(kept))
+                waiting = kept
+        totals = pool.totals()
+        for name in COUNTERS:
+            setattr(stats, name, getattr(stats, name) + totals[name])
+        stats.update(theory_workers=workers, candidates=pool.submitted, dropped_candidates=dropped, wasted_candidates=wasted, core_checks=totals["core_checks"],
+                     worker_check_time=round(totals["check_time"], 6))
+    stats.update(rounds=rounds - count, theory_clauses=len(ssolver.db.theory), deleted=ssolver.db.deleted, cache_misses=cache.misses)
+    return result
+
 
 if __name__ == "__main__":
-    with cProfile.Profile() as pr:
-
-        if len(sys.argv) < 2:
-            sys.exit("Error: No input file passed.")
-        fpath = sys.argv[1]
-        if not exists(fpath):
-            sys.exit(f"Error: {fpath} does not exists.")
-
-        # Build the FNode formula
-        formula, free_vars = read_input(fpath)
-        # build the skeleton map
-        skel_map,rev_map = build_skeleton_map(formula)
-        # build the skeleton
-        skeleton = build_skeleton(formula, skel_map)
-        # how many variables do we have?
-        problem_size = len(skel_map)
+    parser = argparse.ArgumentParser(description="Lazy SMT solver for QF_LRA using the CDCL solver and a simplex (or z3) as a theory solver")
+    parser.add_argument("file", nargs="?", help="SMT-LIB 2 input file")
+    parser.add_argument("--restart", choices=list(RESTART_POLICIES), default="luby", help="restart policy of the SAT solver")
+    parser.add_argument("--theory-cache", type=int, default=1024, metavar="N", help="size of the LRU cache of theory checks (0 disables it)")
+    parser.add_argument("--frontend", choices=["tseitin", "cnfizer"], default="tseitin",
+                        help="build the boolean skeleton by Tseitin encoding the parsed formula, or from the CNF of pysmt's CNFizer")
+    parser.add_argument("--skeleton-cache", metavar="DIR", help="directory to cache the boolean skeletons of the input files in")
+    parser.add_argument("--no-preprocess", dest="preprocess", action="store_false",
+                        help="search on the boolean skeleton as it is, without subsumption and elimination of the Boolean variables first")
+    parser.add_argument("--bound-lemmas", type=int, default=10000, metavar="N",
+                        help="add at most N clauses between the arithmetic atoms over the same linear term before the search (0 disables them)")
+    parser.add_argument("--theory", choices=list(THEORIES), default="simplex",
+                        help="theory solver: the built-in simplex (z3 is used anyway if an atom is not linear), or z3")
+    parser.add_argument("--simplex-float", dest="exact", action="store_false",
+                        help="run the simplex on floats and verify its answers with exact arithmetic, instead of on fractions")
+    parser.add_argument("--core-extraction", choices=list(CORE_EXTRACTIONS), default="assumptions",
+                        help="get the unsat cores of z3 from tracking literals of the atoms checked as assumptions, or from named assertions")
+    parser.add_argument("--core-minimization", choices=list(CORE_MINIMIZATIONS), default="deletion",
+                        help="minimize the unsat cores of the theory by deleting literals one by one, or with QuickXplain")
+    parser.add_argument("--core-budget", type=float, default=0.1, metavar="SECONDS", help="time limit of the minimization of one core")
+    parser.add_argument("--online", action="store_true", help="check the theory during the SAT search (DPLL(T)) instead of on complete models")
+    parser.add_argument("--pipeline", type=int, default=0, metavar="N",
+                        help="check the complete Boolean models with N theory worker processes while the SAT solver searches for more")
+    parser.add_argument("--portfolio", type=int, default=1, metavar="N",
+                        help="run N differently configured SAT solvers (each with its own theory solver) in parallel, the first answer wins")
+    parser.add_argument("--no-share", dest="share", action="store_false",
+                        help="do not share the short learned clauses between the solvers of the portfolio")
+    parser.add_argument("--stats", metavar="FILE", help="write the counters and phase times of the run (conflicts, theory checks, ...) to a JSON file")
+    parser.add_argument("--progress", type=float, default=0, metavar="SECONDS", help="write a line of the counters to stderr every SECONDS during the search")
+    parser.add_argument("--profile", nargs="?", const="", metavar="FILE",
+                        help="run under cProfile and write the profile to FILE (default: perf-stats-<input file>.txt)")
+    args = parser.parse_args()
+
+    if args.pipeline > 0 and (args.online or args.portfolio > 1):
+        parser.error("--pipeline checks the models of one lazy search, it does not go with --online or --portfolio")
+    if args.file is None:
+        sys.exit("Error: No input file passed.")
+    fpath = args.file
+    if not exists(fpath):
+        sys.exit(f"Error: {fpath} does not exists.")
+
+    stats = Stats(args.progress)
+    with cProfile.Profile() if args.profile is not None else nullcontext() as pr:
+        with stats.timer("parse"):
+            skeleton_cache = SkeletonCache(args.skeleton_cache, tag=args.frontend) if args.skeleton_cache else None
+            cached = skeleton_cache.load(fpath) if skeleton_cache else None
+            if cached is None and args.frontend == "tseitin":
+                # Tseitin encode the assertions as they are parsed
+                skeleton, skel_map, rev_map = read_skeleton(fpath, stats)
+            elif cached is None:
+                # Build the FNode formula
+                formula, free_vars = read_input(fpath)
+                with stats.timer("cnf"):
+                    # build the skeleton map
+                    skel_map,rev_map = build_skeleton_map(formula)
+                    # build the skeleton
+                    skeleton = build_skeleton(formula, skel_map)
+            if cached is None:
+                # how many variables do we have?
+                problem_size = len(skel_map)
+                shared = shared_symbols(rev_map.values())
+                theory_atoms = [i for i, atom in rev_map.items() if is_theory_atom(atom, shared)]
+                atoms = Atoms.of(skel_map, rev_map)
+                if skeleton_cache:
+                    skeleton_cache.store(fpath, skeleton, rev_map)
+            else:
+                # the atoms are only parsed once the theory solver needs them (atoms.atom_map and atoms.atom_rev)
+                skeleton = cached.clauses()
+                problem_size = cached.size
+                theory_atoms = np.flatnonzero(cached.theory).tolist()
+                atoms = cached.atoms
+
+        stats.update(variables=problem_size, clauses=len(skeleton), theory_atoms=len(theory_atoms))
+        t1 = time.time()
+
+        if args.bound_lemmas > 0 and theory_atoms:
+            # the implications and exclusions between the atoms over the same term are clauses
+            # from the start, instead of theory conflicts one check at a time
+            with stats.timer("lemmas"):
+                lemmas = BoundLemmas(atoms.atom_rev, args.bound_lemmas).run()
+            skeleton = skeleton + lemmas
+            stats.update(bound_lemmas=len(lemmas))
+
+        if args.preprocess:
+            # the theory atoms are frozen: the theory solver has to see them, and the blocking
+            # clauses and theory lemmas are over them, only the Boolean variables (and gates) are
+            # eliminated or substituted by an equivalent literal
+            with stats.timer("preprocess"):
+                pre = Preprocessor(problem_size, skeleton, frozen=theory_atoms)
+                ok = pre.run()
+            stats.update(subsumed=pre.subsumed, strengthened=pre.strengthened, eliminated=sum(pre.eliminated),
+                         substituted=pre.substituted)
+            if not ok:
+                print("unsat")
+                print(time.time() - t1)
+                if args.stats:
+                    stats.write(args.stats)
+                sys.exit()
+            # the variables that are left are numbered 1..n, the atoms keep their formulas through the table
+            skeleton, variables = pre.renumber()
+            problem_size = len(variables) - 1
+            renumbered = {v: i for i, v in enumerate(variables)}
+            theory_atoms = [renumbered[v] for v in theory_atoms]
+            atoms.renumber(variables)
+            stats.update(preprocessed_variables=problem_size, preprocessed_clauses=len(skeleton))
 
         clause_set = []
         # make a list of Clause objects out of a list of ints
@@ -124,64 +427,41 @@ if __name__ == "__main__":
 
         # print("Clause Set: " + str(formula))
         # print("Atoms: " + str(formula.get_atoms()))
-        # print("Atom map: " + str(skel_map))
+        # print("Atom map: " + str(atoms.atom_map))
         # print("Boolean skeleton: " + str(skeleton))
 
-        t1 = time.time()
-        
-        with Solver(name="z3", logic="QF_LRA", unsat_cores_mode="all") as tsolver:
-            count = 5000
-            while count > 0:
-                count -= 1
-                models = []
-                # with  SatSolver() as ssolver:
-                tsolver.set_option(":produce-models", "true")
-                #tsolver.set_option("smt.core.minimize", "True")
-                sat_model = solve(clause_set, problem_size)
-                assert len(list(filter(lambda x: x == sat_model, models))) == 0
-                #print(f"sat model:\n{sat_model}")
-                models.append(sat_model)
-                if sat_model is None:
-                    t2 = time.time()
-                    print("unsat")
-                    break
-                #print(f"sat model {sat_model}")
-                # print(f"tsolver formula {And([build_formula([[l]], rev_map) for l in sat_model ])}")
-                tsolver.push()
-                tsolver.add_assertion(And([build_formula([[l]], rev_map) for l in sat_model ]))
-                if tsolver.solve():
-                    print("sat")
-                    m = tsolver.get_model()
-                    t2 = time.time()
-                    #for v in free_vars:
-                    #    print(f"{v} := {m.get_value(v)}")
-                    break
-                else:
-                    ucore = tsolver.get_unsat_core()
-                    # blocking_clause = And(list(ucore))
-                    blocking_clause = []
-                    for c in ucore:
-                        blocking_clause = Or(list(map(lambda x: Not(x), c.args())))
-                        blocking_clause_skeleton = build_skeleton_clause(blocking_clause, skel_map)
-
-
-
-                        skeleton.append(blocking_clause_skeleton)
-
-                #blocking_clause_skeleton.sort()
-                        blocking_clause = Clause(problem_size, init=blocking_clause_skeleton)
-                        #print(f"Blocking clause: {blocking_clause.to_list()}")
-                        #assert len(list(filter(lambda x: blocking_clause.eq(x), clause_set))) == 0
+        cache = TheoryCache(args.theory_cache)
+        minimizer = CoreMinimizer(args.core_minimization, args.core_budget, stats=stats)
+        theory_options = {"exact": args.exact, "cores": args.core_extraction, "minimizer": minimizer}
+        if args.pipeline > 0:
+            search = lambda config, share: search_pipelined(problem_size, clause_set, theory_atoms, atoms, cache, stats, args.theory,
+                                                            theory_options, args.pipeline, share=share, **config)
+        elif args.online:
+            search = lambda config, share: search_online(problem_size, clause_set, atoms, cache, stats, args.theory, theory_options,
+                                                             share=share, **config)
+        else:
+            search = lambda config, share: search_lazy(problem_size, clause_set, theory_atoms, atoms, cache, stats, args.theory, theory_options,
+                                                           share=share, **config)
+        if args.portfolio > 1:
+            # the atoms of a cached skeleton are parsed once, before the workers are forked
+            atoms.load()
+            # the workers count into their own copies of stats
+            winner, result = Portfolio(args.portfolio, restart=args.restart, share=args.share).run(search)
+            stats.update(portfolio_winner=winner)
+        else:
+            result = search({"restart": args.restart}, None)
+            if args.pipeline == 0:
+                stats.update(core_checks=minimizer.checks)
+        t2 = time.time()
+        print(result)
 
-                        clause_set.append(blocking_clause)
-                #print(f"blocking clause: {len(blocking_clause_skeleton)} {blocking_clause_skeleton}")
-                        tsolver.pop()
+    if args.stats:
+        stats.write(args.stats)
+    if args.profile is not None:
         sortby = SortKey.CUMULATIVE
-        with open(f"perf-stats-{basename(fpath)}.txt", "w", encoding="utf-8") as s:
+        with open(args.profile or f"perf-stats-{basename(fpath)}.txt", "w", encoding="utf-8") as s:
             ps = pstats.Stats(pr, stream=s).sort_stats(sortby)
             ps.print_stats()
-        
-        if count == 0:
-            print("unknown")
-        else:
-            print(t2 - t1)
+
+    if result != UNKNOWN:
+        print(t2 - t1)
@@ -4,55 +4,86 @@ Using this to test whether the SAT solver is working correctly
 Adapted from - https://kienyew.github.io/CDCL-SAT-Solver-from-Scratch/The-Implementation.html
 
 How to run -
-python parse-dimacs.py <filename>
+python parse-dimacs.py <filename> [--restart {none,luby,glucose}] [--no-preprocess] [--portfolio N [--no-share]] [--cubes N [--cube-depth D]] [--stats FILE] [--progress SECONDS]
 """
 
 import sys
-from cdcl import solve
-from Model import Model
-from Clause import Clause
-
-
-def parse_dimacs_cnf(content: str):
-    """
-    parse the DIMACS cnf file format into corresponding Formula.
-    """
-    clauses = [[]]
-    literals = 0
-    for line in content.splitlines():
-        tokens = line.split()
-        if len(tokens) != 0 and tokens[0] not in ("p", "c"):
-            for tok in tokens:
-                lit = int(tok)
-                if lit == 0:
-                    clauses.append([])
-                else:
-                    clauses[-1].append(lit)
-                    literals = max(literals,lit)
-
-    if len(clauses[-1]) == 0:
-        clauses.pop()
-
-    return (clauses,literals)
-
-if len(sys.argv) < 2:
+import argparse
+from cdcl import solve, Solver
+from ClauseDB import ClauseDB
+from Dimacs import read_dimacs
+from Preprocessor import Preprocessor
+from Portfolio import Portfolio
+from Cubes import CubeAndConquer
+from Restart import RESTART_POLICIES
+from Stats import Stats
+
+
+parser = argparse.ArgumentParser(description="Runs the CDCL solver on a DIMACS cnf file")
+parser.add_argument("file", nargs="?", help="DIMACS cnf input file (.gz, .xz and .bz2 files are decompressed)")
+parser.add_argument("--restart", choices=list(RESTART_POLICIES), default="luby", help="restart policy of the solver")
+parser.add_argument("--stats", metavar="FILE", help="write the counters and phase times of the run (conflicts, ...) to a JSON file")
+parser.add_argument("--progress", type=float, default=0, metavar="SECONDS", help="write a line of the counters to stderr every SECONDS during the search")
+parser.add_argument("--no-preprocess", dest="preprocess", action="store_false",
+                    help="search on the clauses as they are, without subsumption and variable elimination first")
+parser.add_argument("--portfolio", type=int, default=1, metavar="N", help="run N differently configured solvers in parallel, the first answer wins")
+parser.add_argument("--no-share", dest="share", action="store_false", help="do not share the short learned clauses between the solvers of the portfolio")
+parser.add_argument("--cubes", type=int, default=0, metavar="N", help="split the problem into cubes by lookahead and solve them with N parallel solvers")
+parser.add_argument("--cube-depth", type=int, metavar="D", help="depth of the lookahead split into (at most 2^D) cubes, by default 4 cubes per solver")
+args = parser.parse_args()
+
+if args.file is None:
     print("No file given")
     sys.exit()
 
-fname = sys.argv[1]
+fname = args.file
+stats = Stats(args.progress)
 
-content = str(open(fname,"r").read())
+with stats.timer("parse"):
+    lits, offsets, problem_size = read_dimacs(fname)
+stats.update(variables=problem_size, clauses=len(offsets) - 1)
+if args.preprocess:
+    with stats.timer("preprocess"):
+        offsets = offsets.tolist()
+        lits = lits.tolist()
+        pre = Preprocessor(problem_size, (lits[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)))
+        ok = pre.run()
+    stats.update(subsumed=pre.subsumed, strengthened=pre.strengthened, eliminated=sum(pre.eliminated), substituted=pre.substituted)
+    if not ok:
+        print(None)
+        if args.stats:
+            stats.write(args.stats)
+        sys.exit()
+    # the solver only gets the variables that are left, numbered 1..n
+    clauses, variables = pre.renumber()
+    db = ClauseDB(clauses)
+    size = len(variables) - 1
+    stats.update(preprocessed_variables=size, preprocessed_clauses=len(clauses))
+else:
+    # the clauses go from the tokenized file straight into the clause arena
+    db = ClauseDB()
+    db.add_all(lits, offsets)
+    size = problem_size
 
-skeleton,problem_size = parse_dimacs_cnf(content)
-clause_set = []
-# make a list of Clause objects out of a list of ints
-for clause in skeleton:
-    c = Clause(problem_size)
-    for lit in clause:
-        c.add(lit)
-        #print(f"list: {clause}, Clause: {c.data}")
-    clause_set.append(c)
+with stats.timer("sat"):
+    if args.cubes > 0:
+        cubes = CubeAndConquer(args.cubes, args.cube_depth, restart=args.restart)
+        model = cubes.solve(size, db)
+        stats.update(cubes=cubes.cubes, refuted_cubes=cubes.refuted)
+    elif args.portfolio > 1:
+        # every worker builds its solver on its own (forked) copy of the clause database
+        winner, model = Portfolio(args.portfolio, restart=args.restart, share=args.share).run(
+            lambda config, share: Solver(size, db=db, share=share, **config).solve())
+        stats.update(portfolio_winner=winner)
+    else:
+        model = solve(db,size,restart=args.restart,stats=stats)
+if model is not None and args.preprocess:
+    # the eliminated variables get values that satisfy the clauses of the file
+    model = pre.extend(model)
+print(model)
 
-print(clause_set)
-print()
-print(solve(clause_set,problem_size))
+if args.stats:
+    if args.portfolio <= 1 and args.cubes <= 0:
+        # the workers of a portfolio (or of the cubes) search on their own copies of the database and stats
+        stats.update(deleted=db.deleted)
+    stats.write(args.stats)